@@ -0,0 +1,206 @@
+"""
+This module solves files containing many Sudoku puzzles. Each line
+of the input file holds one puzzle as 81 characters, read row by row,
+with 0 or . for unfilled cells. Lines of 16, 256 or 625 characters hold
+4x4, 16x16 or 25x25 puzzles, with the digits from 10 up written as the
+letters A to P. Each line of the output file holds the
+solution in the same format, followed by the status, the time taken
+and the number of nodes searched. No plots are created. Puzzles are
+streamed through streamio, so input files of any size can be solved,
+and a path of '-' reads from stdin or writes to stdout.
+
+Anything after a comma on an input line is ignored, so the output of
+generator.py can be solved directly.
+
+With --unique, every puzzle is first checked with count_solutions and
+only proper puzzles (exactly one solution) are solved; the others are
+reported as 'ambiguous' or 'unsolvable'. With --cache, puzzles that are
+the same up to symmetry are answered from a solution cache, which is
+loaded from and saved to the given file. The cache only holds 9x9
+puzzles; puzzles of other sizes are always solved. With --timings, the
+phases of every puzzle are timed as in sudokusolver.py, and each JSON
+line also holds the line number of the puzzle.
+
+Usage: python -m sudokusolver.batch </path/to/puzzles.txt|-> [</path/to/output.txt|->] [--strategy <name>]
+           [--unique] [--cache </path/to/cache.txt>] [--timings [</path/to/timings.jsonl>]]
+           [--profile <dir>] [--trace-memory]
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import time
+import sys
+import argparse
+
+from . import sudokusolver as solver
+from . import xumpy as xp
+from . import streamio
+from . import cache
+from .geometry import SIZE, box_size_of
+from .tracing import SolveStats
+from .instrumentation import NO_INSTRUMENTATION
+
+# symbol of each digit in a puzzle line
+SYMBOLS = '0123456789ABCDEFGHIJKLMNOP'
+
+
+def main():
+    """
+    Main method for batch solving. Prints a summary of the run.
+    """
+    args = parse_arguments(sys.argv[1:])
+    out_path = args.out_path or output_path(args.path)
+    solution_cache = cache.SolutionCache(args.cache_size, args.cache) if args.cache else None
+    instrumentation = solver.create_instrumentation(args)
+    ts = time.time()
+    counts = solve_batch(args.path, out_path, args.strategy, solution_cache, args.unique, instrumentation)
+    elapsed = time.time() - ts
+    if solution_cache is not None:
+        solution_cache.save()
+    solver.close_instrumentation(instrumentation)
+    # keep the summary out of the solutions when they go to stdout
+    out = sys.stderr if out_path == '-' else sys.stdout
+    out.write('============= Batch =============\n')
+    out.write('Puzzles:     {}\n'.format(sum(counts.values())))
+    for status in sorted(counts):
+        out.write('  {:<10} {}\n'.format(status, counts[status]))
+    out.write('Total time:  {:.4f} secs\n'.format(elapsed))
+    if solution_cache is not None:
+        out.write('Cache:       {hits} hits, {misses} misses, {evictions} evictions\n'.format(
+            **solution_cache.counters()))
+    out.write('Output:      {}\n'.format(out_path))
+    out.write('=================================\n')
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    parser = argparse.ArgumentParser(description='Solve a file of Sudoku puzzles, one per line.')
+    parser.add_argument('path', help='path to the puzzle file')
+    parser.add_argument('out_path', nargs='?', help='path to the output file')
+    parser.add_argument('--strategy', default='propagate', choices=solver.STRATEGIES,
+                        help='search strategy used to solve the puzzles')
+    parser.add_argument('--unique', action='store_true', help='only solve puzzles with exactly one solution')
+    parser.add_argument('--cache', help='path to the solution cache file')
+    parser.add_argument('--cache-size', type=int, default=10000, help='maximum number of cached solutions')
+    parser.add_argument('--timings', nargs='?', const='-', metavar='PATH',
+                        help='write the time of each phase as JSON lines (default: stderr)')
+    parser.add_argument('--profile', metavar='DIR', help='save a cProfile profile of each phase to DIR')
+    parser.add_argument('--trace-memory', action='store_true', help='add the memory allocated by each phase')
+    return parser.parse_args(argv)
+
+
+def output_path(path):
+    """
+    Returns <input_file_name>_out.<ext> for path, or '-' for stdin
+    """
+    if path == '-':
+        return '-'
+    if '.' in path.rsplit('/', 1)[-1]:
+        [stem, ext] = path.rsplit('.', 1)
+        return stem + '_out.' + ext
+    return path + '_out'
+
+
+def parse_puzzle(line):
+    """
+    Converts a puzzle line to a matrix: 81 characters give a 9x9 matrix,
+    16, 256 or 625 characters a 4x4, 16x16 or 25x25 one. Fields after
+    the first comma are ignored.
+    """
+    line = line.split(',', 1)[0]
+    size = int(round(len(line) ** 0.5))
+    assert size * size == len(line) and box_size_of(size) is not None and size < len(SYMBOLS), \
+        'Puzzle line does not have 16, 81, 256 or 625 cells: {}'.format(line)
+    values = [0 if c == '.' else SYMBOLS.index(c.upper()) for c in line]
+    return [values[i * size:i * size + size] for i in range(size)]
+
+
+def format_puzzle(matrix):
+    """
+    Converts a matrix to a puzzle line
+    """
+    return ''.join(SYMBOLS[val] for row in matrix for val in row)
+
+
+def solve_one(line, strategy, solution_cache=None, unique=False, instrumentation=NO_INSTRUMENTATION):
+    """
+    Parses, validates and solves a single puzzle line, through the solution
+    cache if one is given. If unique is set, puzzles without exactly one
+    solution are rejected before solving. Returns [solved_matrix, status,
+    secs, nodes], where status is 'solved', 'unsolvable', 'ambiguous' or
+    'invalid'. The phases are timed by instrumentation.
+    """
+    ts = time.time()
+    try:
+        with instrumentation.phase('load'):
+            input_matrix = parse_puzzle(line)
+        with instrumentation.phase('validate'):
+            solver.validate_input(input_matrix)
+    except (AssertionError, ValueError):
+        return [None, 'invalid', time.time() - ts, 0]
+    if unique:
+        count = solver.count_solutions(input_matrix, 2)
+        if count != 1:
+            return [None, 'ambiguous' if count else 'unsolvable', time.time() - ts, 0]
+    zero_indices = xp.where(input_matrix, 0)
+    # only the node count is reported, so no trace is kept
+    stats = SolveStats('counters')
+    if solution_cache is not None and len(input_matrix) == SIZE:
+        [solved_matrix, stats] = solution_cache.solve(input_matrix, zero_indices, strategy, stats)
+    else:
+        [solved_matrix, stats] = solver.solve_puzzle(input_matrix, zero_indices, strategy, stats, instrumentation)
+    if solved_matrix is None:
+        return [None, 'unsolvable', time.time() - ts, stats.nodes]
+    try:
+        solver.validate_solution(solved_matrix)
+    except AssertionError:
+        return [None, 'invalid', time.time() - ts, stats.nodes]
+    return [solved_matrix, 'solved', time.time() - ts, stats.nodes]
+
+
+def format_result(solution, status, secs, nodes):
+    """
+    Formats one output line: <solution>,<status>,<secs>,<nodes>
+    """
+    return '{},{},{:.6f},{}\n'.format(solution, status, secs, nodes)
+
+
+def solve_lines(lines, strategy, counts, solution_cache=None, unique=False, instrumentation=NO_INSTRUMENTATION):
+    """
+    Solves each puzzle line from the iterable and yields its output line.
+    The number of puzzles with each status is added to counts.
+    """
+    for (number, line) in enumerate(lines):
+        if instrumentation is not NO_INSTRUMENTATION:
+            instrumentation.context['line'] = number + 1
+        [solved_matrix, status, secs, nodes] = solve_one(line, strategy, solution_cache, unique, instrumentation)
+        solution = format_puzzle(solved_matrix) if solved_matrix is not None else ''
+        counts[status] = counts.get(status, 0) + 1
+        yield format_result(solution, status, secs, nodes)
+
+
+def solve_batch(path, out_path, strategy='propagate', solution_cache=None, unique=False,
+                instrumentation=NO_INSTRUMENTATION):
+    """
+    Solves every puzzle in path and writes one line per puzzle to out_path:
+    <solution>,<status>,<secs>,<nodes>. The solution is empty if the puzzle
+    was not solved. Returns the number of puzzles with each status.
+    """
+    counts = {}
+    in_stream = streamio.open_input(path)
+    try:
+        out_stream = streamio.open_output(out_path)
+        try:
+            lines = streamio.read_puzzle_lines(in_stream)
+            streamio.write_lines(out_stream, solve_lines(lines, strategy, counts, solution_cache, unique,
+                                                         instrumentation))
+        finally:
+            streamio.close(out_stream)
+    finally:
+        streamio.close(in_stream)
+    return counts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+This module contains benchmarks for the Sudoku solver. It compares
+the peer-scanning evaluate_solution checker with the used-digit masks
+kept by ConstraintState, both on isolated candidate checks and on a
+full backtracking solve, the search speed of the recursive and
+iterative solvers, and the solve time of every strategy on the
+bundled puzzles, the copy cost and memory of the list of lists
+matrix against the compact xumpy.Grid, the solve time on random
+4x4, 9x9, 16x16 and 25x25 puzzles, the overhead of each stats
+level, and the batch validation and candidate computation in pure
+Python against NumPy (if installed) for growing batch sizes.
+
+Usage: python -m sudokusolver.benchmark [</path/to/input/file.csv>]
+    Default: '/data/input_hard.csv'
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import time
+import sys
+import os
+import random
+
+from . import sudokusolver as solver
+from . import xumpy as xp
+from . import generator
+from . import vectorized
+from .constraints import ConstraintState
+from .geometry import SIZE
+from .tracing import SolveStats, LEVELS
+
+
+def benchmark_checker(path, repeat=200):
+    """
+    Times evaluate_solution against ConstraintState.allows for every
+    candidate of every unfilled cell in the problem file
+    """
+    [input_matrix, zero_indices] = solver.load_input(path)
+    cells = list(zip(zero_indices[0], zero_indices[1]))
+    matrix = xp.copy(input_matrix)
+    ts = time.time()
+    for _ in range(repeat):
+        for (i, j) in cells:
+            for n in solver.DIGITS:
+                solver.evaluate_solution(matrix, i, j, n)
+    scan_time = time.time() - ts
+    state = ConstraintState(input_matrix)
+    ts = time.time()
+    for _ in range(repeat):
+        for (i, j) in cells:
+            for n in solver.DIGITS:
+                state.allows(i, j, n)
+    mask_time = time.time() - ts
+    return {'checks': repeat * len(cells) * 9, 'scan': scan_time, 'mask': mask_time}
+
+
+def benchmark_solver(path, repeat=5):
+    """
+    Times a full solve with the scan-based checker and with the masks
+    """
+    [input_matrix, zero_indices] = solver.load_input(path)
+    ts = time.time()
+    for _ in range(repeat):
+        scan_solve(xp.copy(input_matrix), zero_indices, -1)
+    scan_time = (time.time() - ts) / repeat
+    ts = time.time()
+    for _ in range(repeat):
+        solver.solve(xp.copy(input_matrix), zero_indices, -1, SolveStats('off'))
+    mask_time = (time.time() - ts) / repeat
+    return {'scan': scan_time, 'mask': mask_time}
+
+
+def benchmark_search(path, repeat=5):
+    """
+    Measures nodes per second of the recursive and iterative solvers.
+    A node is one candidate tried, as counted by stats.nodes.
+    """
+    [input_matrix, zero_indices] = solver.load_input(path)
+    results = {}
+    for name in ('recursive', 'iterative'):
+        nodes = 0
+        ts = time.time()
+        for _ in range(repeat):
+            stats = SolveStats('counters')
+            if name == 'recursive':
+                solver.solve(xp.copy(input_matrix), zero_indices, -1, stats)
+            else:
+                solver.solve_iterative(xp.copy(input_matrix), zero_indices, stats)
+            nodes += stats.nodes
+        results[name] = nodes / (time.time() - ts)
+    return results
+
+
+def benchmark_strategies(paths, repeat=3):
+    """
+    Times every strategy in sudokusolver.STRATEGIES on each problem file.
+    Returns {strategy: {path: [secs per solve, nodes]}}.
+    """
+    problems = [(path, solver.load_input(path)) for path in paths]
+    results = {}
+    for strategy in solver.STRATEGIES:
+        results[strategy] = {}
+        for (path, [input_matrix, zero_indices]) in problems:
+            ts = time.time()
+            for _ in range(repeat):
+                [solved_matrix, stats] = solver.solve_puzzle(input_matrix, zero_indices, strategy,
+                                                             SolveStats('counters'))
+            results[strategy][path] = [(time.time() - ts) / repeat, stats.nodes]
+    return results
+
+
+def benchmark_grid(path, repeat=20000):
+    """
+    Times copies of the list of lists matrix and of xumpy.Grid, and
+    measures the bytes each one takes
+    """
+    [input_matrix, zero_indices] = solver.load_input(path)
+    grid = xp.Grid.from_matrix(input_matrix)
+    ts = time.time()
+    for _ in range(repeat):
+        xp.copy(input_matrix)
+    matrix_time = time.time() - ts
+    ts = time.time()
+    for _ in range(repeat):
+        grid.copy()
+    grid_time = time.time() - ts
+    matrix_bytes = sys.getsizeof(input_matrix) + sum(sys.getsizeof(row) for row in input_matrix)
+    grid_bytes = sys.getsizeof(grid) + sys.getsizeof(grid.cells)
+    return {'copies': repeat, 'matrix': matrix_time, 'grid': grid_time,
+            'matrix_bytes': matrix_bytes, 'grid_bytes': grid_bytes}
+
+
+def benchmark_sizes(box_sizes=(2, 3, 4, 5), strategies=('propagate', 'dlx'), empty=0.4, seed=0):
+    """
+    Times the strategies on a random puzzle of each box size, made by
+    emptying a fraction of the cells of a random full grid. Returns
+    {box_size: {strategy: [secs, nodes]}}.
+    """
+    rng = random.Random(seed)
+    results = {}
+    for box_size in box_sizes:
+        input_matrix = generator.random_full_grid(rng, box_size)
+        cells = [(i, j) for i in range(len(input_matrix)) for j in range(len(input_matrix))]
+        rng.shuffle(cells)
+        for (i, j) in cells[:int(len(cells) * empty)]:
+            input_matrix[i][j] = 0
+        zero_indices = xp.where(input_matrix, 0)
+        results[box_size] = {}
+        for strategy in strategies:
+            ts = time.time()
+            [solved_matrix, stats] = solver.solve_puzzle(input_matrix, zero_indices, strategy,
+                                                         SolveStats('counters'))
+            results[box_size][strategy] = [time.time() - ts, stats.nodes]
+    return results
+
+
+def benchmark_stats(path, repeat=5, capacity=4096):
+    """
+    Times the iterative solver at every stats level, and with the full
+    trace kept in a ring buffer of the given capacity. Returns
+    {level: [secs per solve, nodes kept]}.
+    """
+    [input_matrix, zero_indices] = solver.load_input(path)
+    configurations = [(level, (level, 1000, None)) for level in LEVELS]
+    configurations.append(('ring', ('trace', 1000, capacity)))
+    results = {}
+    for (name, args) in configurations:
+        ts = time.time()
+        for _ in range(repeat):
+            stats = SolveStats(*args)
+            solver.solve_iterative(xp.copy(input_matrix), zero_indices, stats)
+        results[name] = [(time.time() - ts) / repeat, len(stats.trace())]
+    return results
+
+
+def benchmark_vectorized(path, batch_sizes=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024), repeat=5):
+    """
+    Times validate_solutions on batches of copies of the solution of the
+    puzzle, and candidate_masks on batches of copies of the puzzle, in
+    pure Python and with NumPy. Returns {batch_size: {name: secs}} and,
+    for validation and candidates, the smallest batch size from which
+    NumPy was faster (None if it never was). Returns None without NumPy.
+    """
+    if vectorized.numpy is None:
+        return None
+    [input_matrix, zero_indices] = solver.load_input(path)
+    solved_matrix = solver.solve_puzzle(input_matrix, zero_indices, 'propagate', SolveStats('off'))[0]
+    results = {}
+    for n in batch_sizes:
+        solutions = [xp.copy(solved_matrix) for _ in range(n)]
+        puzzles = [xp.copy(input_matrix) for _ in range(n)]
+        results[n] = {}
+        for (name, function, grids) in (('validate', vectorized.validate_solutions, solutions),
+                                        ('candidates', vectorized.candidate_masks, puzzles)):
+            for use_numpy in (False, True):
+                ts = time.time()
+                for _ in range(repeat):
+                    function(grids, use_numpy)
+                results[n][(name, use_numpy)] = (time.time() - ts) / repeat
+    crossover = {}
+    for name in ('validate', 'candidates'):
+        faster = [n for n in batch_sizes if results[n][(name, True)] < results[n][(name, False)]]
+        crossover[name] = min(faster) if faster else None
+    return {'times': results, 'crossover': crossover}
+
+
+def bundled_problems():
+    """
+    Paths of the 9x9 problem files in the data folder. Other sizes are
+    covered by benchmark_sizes; backtrack can take minutes on a 16x16 grid.
+    """
+    return [PROJECT_ROOT + '/data/' + name for name in sorted(os.listdir(PROJECT_ROOT + '/data'))
+            if name.endswith('.csv') and not name.endswith('_out.csv') and name != 'test_solution.csv'
+            and len(solver.load_input(PROJECT_ROOT + '/data/' + name)[0]) == SIZE]
+
+
+def scan_solve(matrix, zero_indices, current_zero_index):
+    """
+    Reference backtracking solver that checks every candidate with
+    evaluate_solution. Used as the baseline for the benchmarks.
+    """
+    current_zero_index += 1
+    if current_zero_index >= len(zero_indices[0]):
+        return matrix
+    row = zero_indices[0][current_zero_index]
+    col = zero_indices[1][current_zero_index]
+    for number in solver.DIGITS:
+        if solver.evaluate_solution(matrix, row, col, number):
+            matrix[row][col] = number
+            if scan_solve(matrix, zero_indices, current_zero_index) is not None:
+                return matrix
+    matrix[row][col] = 0
+    return None
+
+
+def main():
+    path = PROJECT_ROOT + '/data/input_hard.csv'
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    checker = benchmark_checker(path)
+    print('============ Checker ============')
+    print('Candidate checks: {}'.format(checker['checks']))
+    print('evaluate_solution: {:.4f} secs'.format(checker['scan']))
+    print('ConstraintState:   {:.4f} secs'.format(checker['mask']))
+    print('Speedup:           {:.1f}x'.format(checker['scan'] / checker['mask']))
+    solving = benchmark_solver(path)
+    print('============= Solve =============')
+    print('evaluate_solution: {:.4f} secs'.format(solving['scan']))
+    print('ConstraintState:   {:.4f} secs'.format(solving['mask']))
+    print('Speedup:           {:.1f}x'.format(solving['scan'] / solving['mask']))
+    search = benchmark_search(path)
+    print('============= Search ============')
+    print('Recursive: {:.0f} nodes/sec'.format(search['recursive']))
+    print('Iterative: {:.0f} nodes/sec'.format(search['iterative']))
+    grid = benchmark_grid(path)
+    print('============== Grid =============')
+    print('Copies:          {}'.format(grid['copies']))
+    print('List of lists:   {:.4f} secs {:>5} bytes'.format(grid['matrix'], grid['matrix_bytes']))
+    print('Grid:            {:.4f} secs {:>5} bytes'.format(grid['grid'], grid['grid_bytes']))
+    paths = bundled_problems()
+    strategies = benchmark_strategies(paths)
+    print('=========== Strategies ==========')
+    for problem in paths:
+        print(os.path.basename(problem))
+        for strategy in solver.STRATEGIES:
+            [secs, nodes] = strategies[strategy][problem]
+            print('  {:<10} {:.4f} secs {:>6} nodes'.format(strategy, secs, nodes))
+    tracing = benchmark_stats(path)
+    print('============= Stats =============')
+    for name in LEVELS + ('ring',):
+        [secs, kept] = tracing[name]
+        print('  {:<10} {:.4f} secs {:>8} nodes kept'.format(name, secs, kept))
+    sizes = benchmark_sizes()
+    print('============= Sizes =============')
+    for box_size in sorted(sizes):
+        print('{0}x{0}'.format(box_size * box_size))
+        for strategy in sorted(sizes[box_size]):
+            [secs, nodes] = sizes[box_size][strategy]
+            print('  {:<10} {:.4f} secs {:>6} nodes'.format(strategy, secs, nodes))
+    batches = benchmark_vectorized(path)
+    print('============ Batches ============')
+    if batches is None:
+        print('NumPy is not installed')
+    else:
+        print('{:>6} {:>11} {:>11} {:>11} {:>11}'.format('batch', 'valid py', 'valid np', 'cand py', 'cand np'))
+        for n in sorted(batches['times']):
+            times = batches['times'][n]
+            print('{:>6} {:>11.6f} {:>11.6f} {:>11.6f} {:>11.6f}'.format(
+                n, times[('validate', False)], times[('validate', True)], times[('candidates', False)],
+                times[('candidates', True)]))
+        print('NumPy faster from: validate {validate}, candidates {candidates} grids'.format(**batches['crossover']))
+    print('=================================')
+
+
+if __name__ == "__main__":
+    PROJECT_ROOT = os.path.dirname(os.path.realpath(__file__)).replace('\\', '/').rsplit('/', 1)[0]
+    main()
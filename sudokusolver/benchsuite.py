@@ -0,0 +1,304 @@
+"""
+This module is the reproducible benchmark suite of the Sudoku solver.
+Every strategy is run on three corpora:
+
+    bundled    data/input.csv, data/input_hard.csv and data/input_zeros.csv
+    hard       data/hard_puzzles.txt, known-hard puzzles in the
+               one-puzzle-per-line format
+    generated  puzzles made by generator.py from a fixed seed
+
+backtrack and iterative are only run on the bundled corpus, since a
+single known-hard puzzle can keep them busy for minutes.
+
+For each corpus and strategy the suite reports puzzles/sec, nodes/sec,
+median and p99 latency and peak memory, and writes the results to a
+JSON file together with the commit and Python version, so runs can be
+compared across commits. Given the results of an earlier run as a
+baseline, a drop in puzzles/sec or a rise in p99 latency of more than
+the threshold is reported as a regression and the run fails.
+
+The suite also measures the cold start of the solver in fresh
+interpreters: the time to import sudokusolver, the heavyweight modules
+(such as matplotlib) that the import pulls in, and the wall time of a
+single-puzzle command line solve with --no-plot, less the startup of
+the interpreter itself. The run fails if the solve takes longer than
+the startup budget or if the import loads a heavyweight module.
+
+Usage: python -m sudokusolver.benchsuite [--out </path/to/results.json>] [--baseline </path/to/results.json>]
+           [--threshold <fraction>] [--strategies <name> ...] [--generated <n>] [--seed <n>] [--repeat <n>]
+           [--startup-budget <ms>]
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import sys
+import os
+import ast
+import json
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+from . import sudokusolver as solver
+from . import xumpy as xp
+from . import batch
+from . import generator
+from . import parallel
+from .tracing import SolveStats
+from .instrumentation import now_ns
+
+BUNDLED_FILES = ('input.csv', 'input_hard.csv', 'input_zeros.csv')
+HARD_CORPUS = 'hard_puzzles.txt'
+# strategies that can take minutes on a single known-hard puzzle
+SLOW_STRATEGIES = ('backtrack', 'iterative')
+# modules a solve without a plot should never import
+HEAVY_MODULES = ('matplotlib', 'numpy', 'cProfile')
+# cold-start budget of a single-puzzle solve, beyond interpreter startup
+STARTUP_BUDGET_MS = 50.0
+
+
+def main():
+    """
+    Main method for the benchmark suite. Prints the results, writes them
+    to a JSON file and exits with status 1 if a regression was found.
+    """
+    args = parse_arguments(sys.argv[1:])
+    corpora = load_corpora(PROJECT_ROOT + '/data', args.generated, args.seed)
+    report = run_suite(corpora, args.strategies, args.repeat)
+    report['seed'] = args.seed
+    report['commit'] = current_commit(PROJECT_ROOT)
+    report['startup'] = measure_startup(PROJECT_ROOT, PROJECT_ROOT + '/data/input.csv',
+                                        args.repeat)
+    report['startup']['budget_ms'] = args.startup_budget
+    print_report(report)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('Results:     {}'.format(args.out))
+    regressions = check_startup(report['startup'], args.startup_budget)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions += compare(report, baseline, args.threshold)
+    print('========== Regressions ==========')
+    for regression in regressions:
+        print(regression)
+    print('None' if not regressions else '{} regression(s)'.format(len(regressions)))
+    print('=================================')
+    if regressions:
+        sys.exit(1)
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    parser = argparse.ArgumentParser(description='Run the Sudoku solver benchmark suite.')
+    parser.add_argument('--out', default='benchmark_results.json', help='path to the JSON results file')
+    parser.add_argument('--baseline', help='path to the JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown that counts as a regression (default 0.25)')
+    parser.add_argument('--strategies', nargs='+', default=list(solver.STRATEGIES), choices=solver.STRATEGIES,
+                        help='strategies to benchmark')
+    parser.add_argument('--generated', type=int, default=20, help='number of generated puzzles')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated puzzles')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed passes over each corpus')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_MS, metavar='MS',
+                        help='cold-start budget of a single-puzzle solve (default {:.0f} ms)'.format(
+                            STARTUP_BUDGET_MS))
+    return parser.parse_args(argv)
+
+
+def load_corpora(data_dir, generated=20, seed=0):
+    """
+    Returns [(name, puzzles, strategies)] for the bundled, hard and
+    generated corpora. strategies is None when every strategy can be run.
+    """
+    fast = tuple(s for s in solver.STRATEGIES if s not in SLOW_STRATEGIES)
+    bundled = [solver.load_input(os.path.join(data_dir, name))[0] for name in BUNDLED_FILES]
+    with open(os.path.join(data_dir, HARD_CORPUS), 'r') as f:
+        hard = [batch.parse_puzzle(line) for line in f if line.strip()]
+    puzzles = [generator.generate_puzzle(seed, k)[0] for k in range(generated)]
+    return [('bundled', bundled, None), ('hard', hard, fast), ('generated', puzzles, fast)]
+
+
+def run_suite(corpora, strategies=solver.STRATEGIES, repeat=3):
+    """
+    Benchmarks each strategy on each corpus it can be run on. Returns a
+    report with one result per corpus and strategy.
+    """
+    results = []
+    for (name, puzzles, allowed) in corpora:
+        for strategy in strategies:
+            if allowed is not None and strategy not in allowed:
+                continue
+            result = run_corpus(puzzles, strategy, repeat)
+            result['corpus'] = name
+            result['strategy'] = strategy
+            results.append(result)
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'repeat': repeat,
+            'memory': 'tracemalloc', 'results': results}
+
+
+def run_corpus(puzzles, strategy, repeat=3):
+    """
+    Solves every puzzle repeat times with the strategy, after one warm-up
+    solve, and returns the throughput, latency and memory figures
+    """
+    zero_indices = [xp.where(puzzle, 0) for puzzle in puzzles]
+    solver.solve_puzzle(puzzles[0], zero_indices[0], strategy, SolveStats('off'))
+    latencies = []
+    nodes = 0
+    for _ in range(repeat):
+        for k in range(len(puzzles)):
+            stats = SolveStats('counters')
+            start = now_ns()
+            solver.solve_puzzle(puzzles[k], zero_indices[k], strategy, stats)
+            latencies.append(now_ns() - start)
+            nodes += stats.nodes
+    secs = sum(latencies) / 1e9
+    latencies.sort()
+    return {'puzzles': len(puzzles), 'secs': secs / repeat,
+            'puzzles_per_sec': len(latencies) / secs if secs > 0 else 0.0,
+            'nodes_per_sec': nodes / secs if secs > 0 else 0.0,
+            'median_ms': parallel.percentile(latencies, 50) / 1e6,
+            'p99_ms': parallel.percentile(latencies, 99) / 1e6,
+            'peak_memory_kb': peak_memory_kb(puzzles, zero_indices, strategy)}
+
+
+def peak_memory_kb(puzzles, zero_indices, strategy):
+    """
+    Returns the peak memory allocated by one pass over the puzzles, as
+    traced by tracemalloc
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for k in range(len(puzzles)):
+        solver.solve_puzzle(puzzles[k], zero_indices[k], strategy, SolveStats('counters'))
+    peak = tracemalloc.get_traced_memory()[1]
+    if started:
+        tracemalloc.stop()
+    return max(peak - baseline, 0) / 1024.0
+
+
+def measure_startup(project_root, puzzle_path, repeat=3):
+    """
+    Measures the cold start of the solver in fresh interpreters run from
+    project_root and returns the best of repeat runs, in milliseconds: the
+    interpreter startup, the import of sudokusolver and a command line
+    solve of puzzle_path without a plot, less the interpreter startup.
+    heavy_modules lists the HEAVY_MODULES the import loaded.
+    """
+    probe = ('import sys, time\n'
+             'start = time.time()\n'
+             'import sudokusolver.sudokusolver\n'
+             'elapsed = time.time() - start\n'
+             'heavy = [m for m in {!r} if m in sys.modules]\n'
+             'sys.stdout.write(repr((elapsed, heavy)))\n').format(HEAVY_MODULES)
+    interpreter = []
+    imports = []
+    solves = []
+    # the solution file is written next to the puzzle, so solve a copy
+    work_dir = tempfile.mkdtemp()
+    try:
+        puzzle_copy = os.path.join(work_dir, os.path.basename(puzzle_path))
+        shutil.copy(puzzle_path, puzzle_copy)
+        command = [sys.executable, '-m', 'sudokusolver.sudokusolver', puzzle_copy, '--no-plot',
+                   '--strategy', 'propagate', '--stats', 'counters']
+        for _ in range(repeat):
+            interpreter.append(_wall_ms([sys.executable, '-c', 'pass'], project_root)[0])
+            output = _wall_ms([sys.executable, '-c', probe], project_root)[1]
+            (elapsed, heavy) = ast.literal_eval(output)
+            imports.append(elapsed * 1000)
+            solves.append(_wall_ms(command, project_root)[0])
+    finally:
+        shutil.rmtree(work_dir)
+    return {'interpreter_ms': min(interpreter), 'import_ms': min(imports),
+            'solve_ms': max(min(solves) - min(interpreter), 0.0), 'heavy_modules': heavy}
+
+
+def _wall_ms(command, cwd):
+    """
+    Runs command and returns its wall time in milliseconds and its output
+    """
+    with open(os.devnull, 'w') as devnull:
+        start = now_ns()
+        output = subprocess.check_output(command, cwd=cwd, stderr=devnull)
+        elapsed = now_ns() - start
+    return elapsed / 1e6, output.decode('ascii', 'replace')
+
+
+def check_startup(startup, budget_ms=STARTUP_BUDGET_MS):
+    """
+    Returns a description of every way the startup measured by
+    measure_startup breaks the budget
+    """
+    problems = []
+    if startup['solve_ms'] > budget_ms:
+        problems.append('startup: single-puzzle solve took {:.1f} ms, budget {:.1f} ms'.format(
+            startup['solve_ms'], budget_ms))
+    for module in startup['heavy_modules']:
+        problems.append('startup: importing sudokusolver loads {}'.format(module))
+    return problems
+
+
+def compare(report, baseline, threshold=0.25):
+    """
+    Compares a report with the report of an earlier run and returns a
+    description of every regression: puzzles/sec lower, or p99 latency
+    higher, by more than threshold (a fraction) for the same corpus and
+    strategy
+    """
+    previous = dict(((r['corpus'], r['strategy']), r) for r in baseline['results'])
+    regressions = []
+    for result in report['results']:
+        key = (result['corpus'], result['strategy'])
+        if key not in previous:
+            continue
+        old = previous[key]
+        if result['puzzles_per_sec'] < old['puzzles_per_sec'] * (1 - threshold):
+            regressions.append('{} {}: {:.1f} puzzles/sec, was {:.1f}'.format(
+                key[0], key[1], result['puzzles_per_sec'], old['puzzles_per_sec']))
+        if result['p99_ms'] > old['p99_ms'] * (1 + threshold):
+            regressions.append('{} {}: p99 {:.3f} ms, was {:.3f} ms'.format(
+                key[0], key[1], result['p99_ms'], old['p99_ms']))
+    return regressions
+
+
+def current_commit(path):
+    """
+    Returns the git commit checked out at path, or None
+    """
+    with open(os.devnull, 'w') as devnull:
+        try:
+            output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=path, stderr=devnull)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return output.decode('ascii').strip()
+
+
+def print_report(report):
+    print('========= Benchmark suite =========')
+    print('Python {} on {}'.format(report['python'], report['platform']))
+    print('{:<10} {:<10} {:>10} {:>12} {:>10} {:>10} {:>10}'.format(
+        'corpus', 'strategy', 'puzzles/s', 'nodes/s', 'p50 ms', 'p99 ms', 'peak kB'))
+    for r in report['results']:
+        peak = '{:.0f}'.format(r['peak_memory_kb']) if r['peak_memory_kb'] is not None else '-'
+        print('{:<10} {:<10} {:>10.1f} {:>12.0f} {:>10.3f} {:>10.3f} {:>10}'.format(
+            r['corpus'], r['strategy'], r['puzzles_per_sec'], r['nodes_per_sec'], r['median_ms'], r['p99_ms'],
+            peak))
+    if 'startup' in report:
+        startup = report['startup']
+        print('Startup:     interpreter {:.1f} ms, import {:.1f} ms, solve {:.1f} ms (budget {:.1f} ms)'.format(
+            startup['interpreter_ms'], startup['import_ms'], startup['solve_ms'], startup['budget_ms']))
+    print('===================================')
+
+
+if __name__ == "__main__":
+    PROJECT_ROOT = os.path.dirname(os.path.realpath(__file__)).replace('\\', '/').rsplit('/', 1)[0]
+    main()
@@ -0,0 +1,107 @@
+"""
+This module bounds the work of a solve. A Budget is attached to the
+tracing.SolveStats of a solve, and every node the solver records is
+counted against it. The budget can limit the search to a deadline (in
+seconds from the start of the solve) or to a number of nodes, and can
+be stopped early through a CancellationToken, e.g. by a scheduler in
+another thread. When the budget runs out, BudgetExhausted is raised
+from inside the search and unwinds it, whichever strategy is used.
+
+To keep the search fast, the clock and the token are only looked at
+every check_every nodes. The node limit is exact. A progress callback
+can be given, which is called every progress_every nodes with a dict
+of the nodes explored, the seconds taken and the depth of the search.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import time
+
+# why a search was stopped
+REASONS = ('deadline', 'nodes', 'cancelled')
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised inside the search when the budget runs out. reason is one of
+    REASONS and nodes the number of nodes explored.
+    """
+
+    def __init__(self, reason, nodes):
+        Exception.__init__(self, 'Budget exhausted ({}) after {} nodes'.format(reason, nodes))
+        self.reason = reason
+        self.nodes = nodes
+
+
+class CancellationToken(object):
+    """
+    Stops the solves it is given to once cancel() is called
+    """
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Budget(object):
+    """
+    Limits of one solve. deadline is in seconds and max_nodes a number of
+    nodes; either can be None for no limit. token is a CancellationToken
+    and progress a callback called every progress_every nodes.
+    """
+
+    def __init__(self, deadline=None, max_nodes=None, token=None, progress=None, progress_every=10000,
+                 check_every=256):
+        assert max_nodes is None or max_nodes >= 0, 'Node budget should not be negative'
+        assert progress_every > 0 and check_every > 0, 'Check intervals should be positive'
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.token = token
+        self.progress = progress
+        self.progress_every = progress_every
+        self.check_every = check_every
+        self.nodes = 0
+
+    def attach(self, stats):
+        """
+        Starts the clock and counts every node recorded in stats against
+        the budget, until detach is called. Raises BudgetExhausted if the
+        budget is already spent.
+        """
+        self.start = time.perf_counter()
+        self.end = None if self.deadline is None else self.start + self.deadline
+        self.nodes = 0
+        self.next_progress = self.progress_every if self.progress is not None else None
+        self._stats_record = stats.record
+        # SolveStats binds record per instance, so it can be swapped the same way
+        stats.record = self.record
+        self._check(0)
+
+    def detach(self, stats):
+        stats.record = self._stats_record
+
+    def record(self, prev_position, position, prev_value, value, depth):
+        # checked before the node is explored, so nodes counts explored nodes only
+        if self.nodes >= self.next_check:
+            self._check(depth)
+        self.nodes += 1
+        self._stats_record(prev_position, position, prev_value, value, depth)
+
+    def _check(self, depth):
+        if self.token is not None and self.token.cancelled:
+            raise BudgetExhausted('cancelled', self.nodes)
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise BudgetExhausted('nodes', self.nodes)
+        now = time.perf_counter()
+        if self.end is not None and now >= self.end:
+            raise BudgetExhausted('deadline', self.nodes)
+        next_check = self.nodes + self.check_every
+        if self.max_nodes is not None:
+            next_check = min(next_check, self.max_nodes)
+        if self.next_progress is not None:
+            if self.nodes >= self.next_progress:
+                self.progress({'nodes': self.nodes, 'secs': now - self.start, 'depth': depth})
+                self.next_progress += self.progress_every
+            next_check = min(next_check, self.next_progress)
+        self.next_check = next_check
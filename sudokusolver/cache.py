@@ -0,0 +1,217 @@
+"""
+This module contains a solution cache for Sudoku puzzles. Puzzles
+that are the same up to symmetry share one cache entry: each puzzle
+is reduced to a canonical form, the cache stores the solution of the
+canonical form, and a hit maps that solution back to the puzzle.
+
+The symmetries used are transposition, permutations of the rows
+within each band, permutations of the columns within each stack and
+relabeling of the digits. The canonical form is the smallest 81 digit
+string, read row by row, that any of these transforms can produce
+when the digits are relabeled in order of first appearance.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import itertools
+import os
+from collections import OrderedDict
+
+from . import sudokusolver as solver
+from .geometry import SIZE, BOX_SIZE
+from .tracing import SolveStats
+
+# every ordering of the 3 rows of a band (or columns of a stack)
+BAND_ORDERS = tuple(itertools.permutations(range(BOX_SIZE)))
+# every ordering of the 9 columns that keeps each column in its stack
+COLUMN_ORDERS = tuple(tuple(s * BOX_SIZE + order[s][k] for s in range(BOX_SIZE) for k in range(BOX_SIZE))
+                      for order in itertools.product(BAND_ORDERS, repeat=BOX_SIZE))
+
+
+def canonicalize(matrix):
+    """
+    Returns [canonical, transform]. canonical is the canonical form of the
+    matrix as an 81 character string. transform is (transpose, row_order,
+    col_order, mapping), where cell[r][c] of the canonical form comes from
+    cell[row_order[r]][col_order[c]] of the (transposed) matrix and mapping
+    maps the digits of the matrix to the digits of the canonical form.
+    """
+    best = [None, None]
+    for transpose in (False, True):
+        grid = [list(row) for row in zip(*matrix)] if transpose else matrix
+        for col_order in COLUMN_ORDERS:
+            rows = [tuple(grid[i][j] for j in col_order) for i in range(SIZE)]
+            _search_rows(rows, [], [], {}, 1, best, transpose, col_order)
+    [canonical, transform] = best
+    return [''.join(str(val) for val in canonical), transform]
+
+
+def _search_rows(rows, row_order, prefix, mapping, next_label, best, transpose, col_order):
+    """
+    Picks the rows of the canonical form one at a time, keeping only the
+    choices that give the smallest relabeled row. Ties are explored and
+    branches that are already larger than the best form are dropped.
+    """
+    slot = len(row_order)
+    if slot == SIZE:
+        if best[0] is None or prefix < best[0]:
+            best[0] = prefix
+            best[1] = (transpose, tuple(row_order), col_order, mapping)
+        return
+    band = slot // BOX_SIZE
+    options = []
+    seen = set()
+    for r in range(band * BOX_SIZE, band * BOX_SIZE + BOX_SIZE):
+        # identical rows give identical branches, so only the first is explored
+        if r in row_order or rows[r] in seen:
+            continue
+        seen.add(rows[r])
+        row_mapping = dict(mapping)
+        label = next_label
+        relabeled = []
+        for val in rows[r]:
+            if val != 0 and val not in row_mapping:
+                row_mapping[val] = label
+                label += 1
+            relabeled.append(row_mapping.get(val, 0))
+        options.append((relabeled, r, row_mapping, label))
+    smallest = min(option[0] for option in options)
+    candidate = prefix + smallest
+    if best[0] is not None and candidate > best[0][:len(candidate)]:
+        return
+    for (relabeled, r, row_mapping, label) in options:
+        if relabeled == smallest:
+            _search_rows(rows, row_order + [r], candidate, row_mapping, label, best, transpose, col_order)
+
+
+def complete_mapping(mapping):
+    """
+    Extends a partial digit mapping to all 9 digits. Unmapped digits are
+    paired in increasing order with the labels that are still unused.
+    """
+    full = dict(mapping)
+    unused = [n for n in solver.DIGITS if n not in set(mapping.values())]
+    for n in solver.DIGITS:
+        if n not in full:
+            full[n] = unused.pop(0)
+    return full
+
+
+def apply_transform(matrix, transform):
+    """
+    Maps a matrix (e.g. a solution of the puzzle) to the canonical frame
+    """
+    (transpose, row_order, col_order, mapping) = transform
+    mapping = complete_mapping(mapping)
+    mapping[0] = 0
+    grid = [list(row) for row in zip(*matrix)] if transpose else matrix
+    return [[mapping[grid[row_order[r]][col_order[c]]] for c in range(SIZE)] for r in range(SIZE)]
+
+
+def invert_transform(matrix, transform):
+    """
+    Maps a matrix in the canonical frame back to the frame of the puzzle
+    """
+    (transpose, row_order, col_order, mapping) = transform
+    inverse = dict((v, k) for (k, v) in complete_mapping(mapping).items())
+    inverse[0] = 0
+    grid = [[0] * SIZE for _ in range(SIZE)]
+    for r in range(SIZE):
+        for c in range(SIZE):
+            grid[row_order[r]][col_order[c]] = inverse[matrix[r][c]]
+    return [list(row) for row in zip(*grid)] if transpose else grid
+
+
+class SolutionCache(object):
+    """
+    Bounded LRU cache of solutions keyed by canonical puzzle form. If a
+    path is given, entries are loaded from it on creation and written
+    back by save(). Finding the canonical form costs more than solving
+    an easy puzzle, so the transforms of recently seen puzzles are also
+    kept, keyed by the puzzle itself, to answer exact repeats quickly.
+    """
+
+    def __init__(self, capacity=10000, path=None):
+        self.capacity = capacity
+        self.path = path
+        self.entries = OrderedDict()
+        self.transforms = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def solve(self, input_matrix, zero_indices, strategy='propagate', stats=None):
+        """
+        Same as sudokusolver.solve_puzzle, but answers repeated puzzles
+        from the cache. stats['cached'] tells whether it was a hit.
+        """
+        if stats is None:
+            stats = SolveStats()
+        [canonical, transform] = self.canonicalize(input_matrix)
+        if canonical in self.entries:
+            self.hits += 1
+            solution = self.entries.pop(canonical)
+            self.entries[canonical] = solution
+            stats['cached'] = True
+            if solution is None:
+                return [None, stats]
+            return [invert_transform(solution, transform), stats]
+        self.misses += 1
+        [solved_matrix, stats] = solver.solve_puzzle(input_matrix, zero_indices, strategy, stats)
+        stats['cached'] = False
+        self.put(canonical, apply_transform(solved_matrix, transform) if solved_matrix is not None else None)
+        return [solved_matrix, stats]
+
+    def canonicalize(self, input_matrix):
+        """
+        Same as canonicalize(input_matrix), using the transforms of the
+        recently seen puzzles
+        """
+        key = ''.join(str(val) for row in input_matrix for val in row)
+        if key in self.transforms:
+            result = self.transforms.pop(key)
+        else:
+            result = canonicalize(input_matrix)
+            if len(self.transforms) >= self.capacity:
+                self.transforms.popitem(last=False)
+        self.transforms[key] = result
+        return result
+
+    def put(self, canonical, solution):
+        """
+        Stores the solution (in the canonical frame) of a canonical puzzle
+        """
+        if canonical in self.entries:
+            del self.entries[canonical]
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[canonical] = solution
+
+    def counters(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.entries)}
+
+    def load(self, path):
+        """
+        Loads entries saved by save(), oldest first
+        """
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    [canonical, solution] = line.split(',')
+                    if solution:
+                        solution = [[int(c) for c in solution[i * SIZE:i * SIZE + SIZE]] for i in range(SIZE)]
+                    self.put(canonical, solution or None)
+
+    def save(self, path=None):
+        """
+        Writes the entries as <canonical>,<solution> lines, least recently
+        used first. The solution is empty for puzzles without one.
+        """
+        path = path or self.path
+        with open(path, 'w') as f:
+            for (canonical, solution) in self.entries.items():
+                text = ''.join(str(val) for row in solution for val in row) if solution is not None else ''
+                f.write('{},{}\n'.format(canonical, text))
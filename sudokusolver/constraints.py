@@ -0,0 +1,82 @@
+"""
+This module keeps track of the digits used in every row, column
+and region of a Sudoku matrix. Each unit is represented by a bit
+mask, where bit n - 1 is set when digit n is present: 9 bits for a
+9x9 grid and up to 25 bits for a 25x25 grid. Placing or removing a
+digit updates three masks, and checking a candidate is a single
+bitwise AND, so the solver does not need to scan the matrix.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+from .geometry import geometry_of
+
+# largest supported digit (25x25 grids)
+MAX_DIGIT = 25
+# bit for each digit; index 0 (unfilled cell) has no bit
+BITS = tuple([0] + [1 << (n - 1) for n in range(1, MAX_DIGIT + 1)])
+# number of digits set in each 9-bit mask
+POPCOUNT = tuple(bin(m).count('1') for m in range(512))
+
+
+def popcount(mask):
+    """
+    Returns the number of digits set in a mask of any width
+    """
+    if mask < 512:
+        return POPCOUNT[mask]
+    return bin(mask).count('1')
+
+
+class ConstraintState(object):
+    """
+    Used-digit masks for the rows, columns and regions of a sudoku matrix.
+    conflicts counts the filled cells whose digit was already used in
+    their row, column or region. geometry is the Geometry of the matrix.
+    """
+    __slots__ = ('rows', 'cols', 'boxes', 'conflicts', 'geometry', 'box_at', 'all_digits')
+
+    def __init__(self, matrix):
+        self.geometry = geometry_of(matrix)
+        self.box_at = self.geometry.box_at
+        self.all_digits = self.geometry.all_digits
+        size = self.geometry.size
+        self.rows = [0] * size
+        self.cols = [0] * size
+        self.boxes = [0] * size
+        self.conflicts = 0
+        for (i, j) in self.geometry.coords:
+            if matrix[i][j] != 0:
+                if not self.allows(i, j, matrix[i][j]):
+                    self.conflicts += 1
+                self.place(i, j, matrix[i][j])
+
+    def allows(self, i, j, n):
+        """
+        Checks if n can be placed in cell[i][j] without repeating
+        a digit in its row, column or region
+        """
+        return not (self.rows[i] | self.cols[j] | self.boxes[self.box_at[i][j]]) & BITS[n]
+
+    def place(self, i, j, n):
+        """
+        Marks n as used in the row, column and region of cell[i][j]
+        """
+        bit = BITS[n]
+        self.rows[i] |= bit
+        self.cols[j] |= bit
+        self.boxes[self.box_at[i][j]] |= bit
+
+    def remove(self, i, j, n):
+        """
+        Undoes place(i, j, n)
+        """
+        bit = BITS[n]
+        self.rows[i] &= ~bit
+        self.cols[j] &= ~bit
+        self.boxes[self.box_at[i][j]] &= ~bit
+
+    def candidates(self, i, j):
+        """
+        Returns the mask of digits that can still be placed in cell[i][j]
+        """
+        return self.all_digits & ~(self.rows[i] | self.cols[j] | self.boxes[self.box_at[i][j]])
@@ -0,0 +1,197 @@
+"""
+This module contains a second solver engine based on Knuth's
+Algorithm X with Dancing Links. The Sudoku is encoded as an exact
+cover problem with 729 rows (one per cell and digit) and 324 columns:
+81 for "cell is filled", and 81 each for "digit is in row", "digit is
+in column" and "digit is in region". Grids of other sizes are encoded
+the same way, with size * size * size rows and 4 * size * size columns.
+The links are kept in flat lists of node indices rather than node
+objects.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+from .geometry import geometry_of
+from .tracing import as_stats
+
+
+def exact_cover_columns(geometry, i, j, n):
+    """
+    Returns the four columns covered by placing n in cell[i][j] of a
+    grid with the given geometry. Column 0 is the root, so the columns
+    are numbered from 1.
+    """
+    size = geometry.size
+    cells = size * size
+    d = n - 1
+    return (1 + i * size + j, 1 + cells + i * size + d, 1 + 2 * cells + j * size + d,
+            1 + 3 * cells + geometry.box_at[i][j] * size + d)
+
+
+class DancingLinks(object):
+    """
+    Exact cover matrix of a sudoku problem, with the rows of the
+    filled cells already selected
+    """
+
+    def __init__(self, matrix):
+        self.geometry = geometry_of(matrix)
+        grid_size = self.geometry.size
+        n_columns = 4 * grid_size * grid_size
+        # node 0 is the root and nodes 1..n_columns are the column headers
+        size = n_columns + 1
+        self.left = [c - 1 for c in range(size)]
+        self.right = [c + 1 for c in range(size)]
+        self.left[0] = n_columns
+        self.right[n_columns] = 0
+        self.up = list(range(size))
+        self.down = list(range(size))
+        self.column = list(range(size))
+        self.row = [-1] * size
+        self.size = [0] * size
+        self.consistent = True
+        first_nodes = {}
+        for (i, j) in self.geometry.coords:
+            for n in self.geometry.digits:
+                if matrix[i][j] == 0 or matrix[i][j] == n:
+                    row_id = (i * grid_size + j) * grid_size + n - 1
+                    first_nodes[row_id] = self._add_row(row_id, exact_cover_columns(self.geometry, i, j, n))
+        # select the rows of the filled cells
+        covered = set()
+        for (i, j) in self.geometry.coords:
+            if matrix[i][j] != 0:
+                columns = exact_cover_columns(self.geometry, i, j, matrix[i][j])
+                if covered.intersection(columns):
+                    self.consistent = False
+                    return
+                covered.update(columns)
+                node = first_nodes[(i * grid_size + j) * grid_size + matrix[i][j] - 1]
+                self.cover(self.column[node])
+                k = self.right[node]
+                while k != node:
+                    self.cover(self.column[k])
+                    k = self.right[k]
+
+    def _add_row(self, row_id, columns):
+        first = len(self.column)
+        for (k, c) in enumerate(columns):
+            node = first + k
+            self.column.append(c)
+            self.row.append(row_id)
+            self.size.append(0)
+            # insert at the bottom of column c
+            self.up.append(self.up[c])
+            self.down.append(c)
+            self.down[self.up[c]] = node
+            self.up[c] = node
+            self.size[c] += 1
+            # link the row horizontally
+            self.left.append(first + (k - 1) % len(columns))
+            self.right.append(first + (k + 1) % len(columns))
+        return first
+
+    def cover(self, c):
+        """
+        Removes column c and every row that has a node in it
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        """
+        Undoes cover(c)
+        """
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def search(self, matrix, positions, prev_position, prev_value, stats, limit, depth=1):
+        """
+        Searches for up to limit solutions, filling matrix as rows are
+        selected. Every selected row is recorded in stats using its
+        position in positions, which maps cell number (i * size + j) to the
+        index of the cell in zero_indices. Returns a list with the number of
+        solutions found and a copy of the first one.
+        """
+        right, down, size = self.right, self.down, self.size
+        grid_size = self.geometry.size
+        if right[0] == 0:
+            return [1, [list(r) for r in matrix]]
+        # choose the column with the fewest rows
+        c = right[0]
+        best = c
+        while c != 0:
+            if size[c] < size[best]:
+                best = c
+            c = right[c]
+        if size[best] == 0:
+            return [0, None]
+        found = 0
+        first = None
+        self.cover(best)
+        r = down[best]
+        while r != best:
+            (cell, digit) = divmod(self.row[r], grid_size)
+            (i, j) = divmod(cell, grid_size)
+            position = positions[cell]
+            stats.record(prev_position, position, prev_value, digit + 1, depth)
+            matrix[i][j] = digit + 1
+            k = right[r]
+            while k != r:
+                self.cover(self.column[k])
+                k = right[k]
+            [count, solution] = self.search(matrix, positions, position, digit + 1, stats, limit - found, depth + 1)
+            k = self.left[r]
+            while k != r:
+                self.uncover(self.column[k])
+                k = self.left[k]
+            matrix[i][j] = 0
+            found += count
+            if first is None:
+                first = solution
+            if found >= limit:
+                break
+            r = down[r]
+        self.uncover(best)
+        return [found, first]
+
+
+def solve_dlx(matrix, zero_indices, stats, limit=1):
+    """
+    Solves the sudoku matrix with Dancing Links. Returns the solved matrix
+    (None if there is no solution) and stats, in the same shape as the
+    backtracking solvers. stats['solutions'] holds the number of
+    solutions found, up to limit.
+    """
+    stats = as_stats(stats)
+    links = DancingLinks(matrix)
+    size = links.geometry.size
+    positions = dict((zero_indices[0][p] * size + zero_indices[1][p], p) for p in range(len(zero_indices[0])))
+    if not links.consistent:
+        stats['solutions'] = 0
+        return [None, stats]
+    [count, solution] = links.search(matrix, positions, -1, 0, stats, limit)
+    stats['solutions'] = count
+    if solution is None:
+        return [None, stats]
+    for i in range(size):
+        matrix[i][:] = solution[i]
+    return [matrix, stats]
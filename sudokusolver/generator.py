@@ -0,0 +1,221 @@
+"""
+This module generates Sudoku puzzles with exactly one solution. Each
+puzzle starts from a random full grid; clues are then removed in a
+random order, and a removal is kept only if count_solutions still finds
+a single solution. Every puzzle is labeled by difficulty using the
+number of nodes (stats.nodes) the solver needs.
+
+Generation is reproducible: puzzle k of a run with a given seed is
+always the same, whatever the number of processes. Puzzles are written
+in the one-puzzle-per-line format as <puzzle>,<difficulty>,<nodes>.
+
+Usage: python -m sudokusolver.generator <count> [</path/to/output.txt|->] [--seed <n>]
+           [--processes <n>] [--min-clues <n>] [--strategy <name>]
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import time
+import sys
+import random
+import argparse
+import multiprocessing
+
+from . import sudokusolver as solver
+from . import xumpy as xp
+from . import propagation
+from . import streamio
+from . import batch
+from .tracing import SolveStats
+from .constraints import ConstraintState, BITS, popcount
+from .geometry import BOX_SIZE, get_geometry, geometry_of
+
+# (maximum nodes, label) pairs; puzzles needing more nodes are 'expert'
+DIFFICULTY_LEVELS = ((0, 'easy'), (10, 'medium'), (100, 'hard'))
+
+
+def main():
+    """
+    Main method for the generator. Prints a summary of the run.
+    """
+    args = parse_arguments(sys.argv[1:])
+    ts = time.time()
+    counts = generate_file(args.count, args.out_path, args.seed, args.processes, args.min_clues, args.strategy)
+    elapsed = time.time() - ts
+    # keep the summary out of the puzzles when they go to stdout
+    out = sys.stderr if args.out_path == '-' else sys.stdout
+    out.write('=========== Generator ===========\n')
+    out.write('Puzzles:     {}\n'.format(args.count))
+    for label in sorted(counts):
+        out.write('  {:<10} {}\n'.format(label, counts[label]))
+    out.write('Total time:  {:.4f} secs\n'.format(elapsed))
+    out.write('Throughput:  {:.1f} puzzles/sec\n'.format(args.count / elapsed if elapsed > 0 else 0.0))
+    out.write('Output:      {}\n'.format(args.out_path))
+    out.write('=================================\n')
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    parser = argparse.ArgumentParser(description='Generate Sudoku puzzles with exactly one solution.')
+    parser.add_argument('count', type=int, help='number of puzzles to generate')
+    parser.add_argument('out_path', nargs='?', default='-', help='path to the output file (default: stdout)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the run')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--min-clues', type=int, default=17, help='stop removing clues at this number')
+    parser.add_argument('--strategy', default='propagate', choices=solver.STRATEGIES,
+                        help='strategy whose node count grades the puzzles')
+    return parser.parse_args(argv)
+
+
+def random_full_grid(rng, box_size=BOX_SIZE):
+    """
+    Returns a random completely filled grid with the given box size
+    (a 9x9 grid by default). Grids up to 16x16 are found by a randomized
+    search; a search on an empty 25x25 grid can run into very long dead
+    ends, so larger grids are shuffled from a fixed pattern instead.
+    """
+    size = get_geometry(box_size).size
+    if box_size > 4:
+        return _shuffled_pattern(rng, box_size)
+    matrix = xp.zeros(size, size)
+    _fill(matrix, ConstraintState(matrix), [], rng)
+    return matrix
+
+
+def _shuffled_pattern(rng, box_size):
+    """
+    Returns a full grid built from a valid pattern by shuffling the bands,
+    the rows within each band, the stacks, the columns within each stack
+    and the digits
+    """
+    size = box_size * box_size
+    bands = list(range(box_size))
+    rng.shuffle(bands)
+    rows = []
+    for band in bands:
+        offsets = list(range(box_size))
+        rng.shuffle(offsets)
+        rows.extend(band * box_size + k for k in offsets)
+    stacks = list(range(box_size))
+    rng.shuffle(stacks)
+    cols = []
+    for stack in stacks:
+        offsets = list(range(box_size))
+        rng.shuffle(offsets)
+        cols.extend(stack * box_size + k for k in offsets)
+    digits = list(range(1, size + 1))
+    rng.shuffle(digits)
+    # (box_size * (r % box_size) + r // box_size + c) % size never repeats in a unit
+    return [[digits[(box_size * (r % box_size) + r // box_size + c) % size] for c in cols] for r in rows]
+
+
+def _fill(matrix, state, trail, rng):
+    best = None
+    best_count = state.geometry.size + 1
+    for (i, j) in state.geometry.coords:
+        if matrix[i][j] == 0:
+            count = popcount(state.candidates(i, j))
+            if count < best_count:
+                best = (i, j)
+                best_count = count
+    if best is None:
+        return True
+    (row, col) = best
+    mask = state.candidates(row, col)
+    numbers = [n for n in state.geometry.digits if mask & BITS[n]]
+    rng.shuffle(numbers)
+    for number in numbers:
+        mark = len(trail)
+        propagation.place(matrix, state, trail, row, col, number)
+        if propagation.propagate(matrix, state, trail) is not None and _fill(matrix, state, trail, rng):
+            return True
+        propagation.undo(matrix, state, trail, mark)
+    return False
+
+
+def remove_clues(matrix, rng, min_clues=17):
+    """
+    Empties the cells of a full grid in random order, keeping each removal
+    only if the puzzle still has exactly one solution. Stops when no more
+    cells can be removed or min_clues clues are left.
+    """
+    geometry = geometry_of(matrix)
+    puzzle = xp.copy(matrix)
+    clues = len(geometry.cells)
+    cells = list(geometry.cells)
+    rng.shuffle(cells)
+    for c in cells:
+        if clues <= min_clues:
+            break
+        (i, j) = geometry.coords[c]
+        value = puzzle[i][j]
+        puzzle[i][j] = 0
+        if solver.count_solutions(puzzle, 2) == 1:
+            clues -= 1
+        else:
+            puzzle[i][j] = value
+    return puzzle
+
+
+def grade(puzzle, strategy='propagate'):
+    """
+    Returns [difficulty, nodes], where nodes is the number of nodes the
+    strategy needs to solve the puzzle
+    """
+    [solved_matrix, stats] = solver.solve_puzzle(puzzle, xp.where(puzzle, 0), strategy, SolveStats('counters'))
+    nodes = stats.nodes
+    for (max_nodes, label) in DIFFICULTY_LEVELS:
+        if nodes <= max_nodes:
+            return [label, nodes]
+    return ['expert', nodes]
+
+
+def generate_puzzle(seed, k, min_clues=17, strategy='propagate'):
+    """
+    Generates puzzle k of the run with the given seed. Returns
+    [puzzle, difficulty, nodes].
+    """
+    rng = random.Random(seed * (1 << 32) + k)
+    puzzle = remove_clues(random_full_grid(rng), rng, min_clues)
+    [difficulty, nodes] = grade(puzzle, strategy)
+    return [puzzle, difficulty, nodes]
+
+
+def generate_file(count, out_path, seed=0, processes=None, min_clues=17, strategy='propagate', chunksize=16):
+    """
+    Generates count puzzles on a pool of processes and writes them to
+    out_path in order, one <puzzle>,<difficulty>,<nodes> line each.
+    Returns the number of puzzles of each difficulty.
+    """
+    counts = {}
+    out_stream = streamio.open_output(out_path)
+    pool = multiprocessing.Pool(processes)
+    try:
+        tasks = ((seed, k, min_clues, strategy) for k in range(count))
+        results = pool.imap(_generate_line, tasks, chunksize)
+        streamio.write_lines(out_stream, _count_lines(results, counts))
+    finally:
+        pool.close()
+        pool.join()
+        streamio.close(out_stream)
+    return counts
+
+
+def _count_lines(results, counts):
+    for (line, difficulty) in results:
+        counts[difficulty] = counts.get(difficulty, 0) + 1
+        yield line
+
+
+def _generate_line(task):
+    """
+    Worker function. Returns the output line of one puzzle and its difficulty.
+    """
+    [puzzle, difficulty, nodes] = generate_puzzle(*task)
+    line = '{},{},{}\n'.format(batch.format_puzzle(puzzle), difficulty, nodes)
+    return (line, difficulty)
+
+
+if __name__ == "__main__":
+    main()
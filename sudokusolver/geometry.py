@@ -0,0 +1,105 @@
+"""
+This module describes the geometry of the Sudoku grid. All tables
+are built once per box size and shared by the solvers, the validator
+and the plots, so no module needs to work out regions on its own.
+
+A grid with box size n has n * n rows, columns and regions, and holds
+the digits 1 to n * n: box size 2 gives 4x4 grids, 3 the classic 9x9
+grids, 4 gives 16x16 and 5 gives 25x25 grids. The module level tables
+describe the 9x9 grid; use get_geometry for the other sizes.
+
+Cells are numbered row by row: cell c = i * size + j is in row i and
+column j. Units are the groups of cells that must hold every digit
+once: the first size units are the rows, then the columns, then the
+regions. The peers of a cell are the other cells that share a unit
+with it.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+
+class Geometry(object):
+    """
+    Index tables of a grid with the given box size
+    """
+
+    def __init__(self, box_size):
+        size = box_size * box_size
+        self.box_size = box_size
+        self.size = size
+        self.digits = tuple(range(1, size + 1))
+        self.digit_set = frozenset(self.digits)
+        # mask with every digit set
+        self.all_digits = (1 << size) - 1
+        self.cells = tuple(range(size * size))
+        self.row_of = tuple(c // size for c in self.cells)
+        self.col_of = tuple(c % size for c in self.cells)
+        self.box_of = tuple((self.row_of[c] // box_size) * box_size + self.col_of[c] // box_size for c in self.cells)
+        # (row, col) of each cell
+        self.coords = tuple((self.row_of[c], self.col_of[c]) for c in self.cells)
+        # region of each cell, indexed as box_at[row][col]
+        self.box_at = tuple(tuple(self.box_of[i * size + j] for j in range(size)) for i in range(size))
+        self.row_cells = tuple(tuple(c for c in self.cells if self.row_of[c] == i) for i in range(size))
+        self.col_cells = tuple(tuple(c for c in self.cells if self.col_of[c] == j) for j in range(size))
+        self.box_cells = tuple(tuple(c for c in self.cells if self.box_of[c] == b) for b in range(size))
+        self.units = self.row_cells + self.col_cells + self.box_cells
+        # cells of each unit as (row, col) tuples
+        self.unit_coords = tuple(tuple(self.coords[c] for c in unit) for unit in self.units)
+        self.peers = tuple(tuple(sorted(set(self.row_cells[self.row_of[c]] + self.col_cells[self.col_of[c]] +
+                                            self.box_cells[self.box_of[c]]) - set([c])))
+                           for c in self.cells)
+        self.peer_sets = tuple(frozenset(peers) for peers in self.peers)
+
+
+_geometries = {}
+
+
+def get_geometry(box_size):
+    """
+    Returns the Geometry of the given box size, building it on first use
+    """
+    if box_size not in _geometries:
+        _geometries[box_size] = Geometry(box_size)
+    return _geometries[box_size]
+
+
+def box_size_of(size):
+    """
+    Returns the box size of a grid with size rows, or None if size is
+    not the square of a box size of at least 2
+    """
+    box_size = int(round(size ** 0.5))
+    if box_size >= 2 and box_size * box_size == size:
+        return box_size
+    return None
+
+
+def geometry_of(matrix):
+    """
+    Returns the Geometry of a square matrix
+    """
+    return get_geometry(box_size_of(len(matrix)))
+
+
+_classic = get_geometry(3)
+
+# number of cells in a region side and in a row
+BOX_SIZE = _classic.box_size
+SIZE = _classic.size
+
+CELLS = _classic.cells
+ROW_OF = _classic.row_of
+COL_OF = _classic.col_of
+BOX_OF = _classic.box_of
+# (row, col) of each cell
+COORDS = _classic.coords
+# region of each cell, indexed as BOX_AT[row][col]
+BOX_AT = _classic.box_at
+
+ROW_CELLS = _classic.row_cells
+COL_CELLS = _classic.col_cells
+BOX_CELLS = _classic.box_cells
+UNITS = _classic.units
+# cells of each unit as (row, col) tuples
+UNIT_COORDS = _classic.unit_coords
+PEERS = _classic.peers
+PEER_SETS = _classic.peer_sets
@@ -0,0 +1,284 @@
+"""
+This module stores Sudoku grids (puzzles or solutions) in a compact
+binary file of fixed-size records, so that grid k of a huge archive
+can be read without parsing the grids before it. The file starts with
+an 8-byte header:
+
+    magic      4 bytes, b'SDKG'
+    version    1 byte, 1
+    size       1 byte, 4, 9, 16 or 25
+    cell bits  1 byte, bits per cell: 4 for 4x4 and 9x9, 5 above
+    reserved   1 byte
+
+followed by one record per grid. Each record packs the cells row by
+row into cell bits each, lowest bits first, with 0 for unfilled cells,
+and is padded to whole bytes: 41 bytes for a 9x9 grid (81 cells of 4
+bits). The number of grids follows from the file length, so grids can
+be appended to a file of the same grid size (write_grids with append,
+or pack --append). Packing no grids leaves an empty file without a
+header, which reads as no grids and takes grids of any size.
+
+GridFile reads the file through mmap: indexing grid k costs the same
+for any k and only touches the pages of that record, so bulk jobs can
+seek into and shard the archive. There are converters from and to the
+CSV files of data/ (several grids per file allowed) and the
+one-puzzle-per-line format of batch.py.
+
+Usage: python -m sudokusolver.gridfile pack [--append] </path/to/grids.txt|.csv|-> ... </path/to/grids.sdk>
+       python -m sudokusolver.gridfile unpack </path/to/grids.sdk> [</path/to/grids.txt|->]
+       python -m sudokusolver.gridfile get </path/to/grids.sdk> <k> [</path/to/grid.csv>]
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+
+from . import batch
+from . import streamio
+from . import xumpy as xp
+from .geometry import box_size_of
+
+MAGIC = b'SDKG'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBx')
+# the two 4-bit cells of each byte, lowest bits first
+NIBBLES = tuple((b & 0x0F, b >> 4) for b in range(256))
+
+
+def main():
+    """
+    Main method of the grid file tool. Packs puzzle lines or CSV files
+    into a grid file, unpacks a grid file into puzzle lines, or writes
+    grid k of a grid file as CSV.
+    """
+    args = parse_arguments(sys.argv[1:])
+    if args.command == 'pack':
+        matrices = (matrix for path in args.paths for matrix in read_grids(path))
+        count = write_grids(args.out_path, matrices, args.append)
+        sys.stderr.write('Packed {} grids into {}\n'.format(count, args.out_path))
+    elif args.command == 'unpack':
+        with GridFile(args.path) as grids:
+            out_stream = streamio.open_output(args.out_path)
+            try:
+                streamio.write_lines(out_stream, (batch.format_puzzle(matrix) + '\n' for matrix in grids))
+            finally:
+                streamio.close(out_stream)
+    else:
+        with GridFile(args.path) as grids:
+            matrix = grids[args.index]
+        if args.out_path is None:
+            for row in matrix:
+                print(','.join(str(val) for val in row))
+        else:
+            xp.savetxt(args.out_path, matrix, fmt='%d', delimiter=',')
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    parser = argparse.ArgumentParser(description='Convert Sudoku grids to and from the packed grid file format.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    pack = commands.add_parser('pack', help='pack puzzle lines or CSV files into a grid file')
+    pack.add_argument('paths', nargs='+', help='puzzle line files (- for stdin) and CSV files, packed in order')
+    pack.add_argument('out_path', help='path to the grid file')
+    pack.add_argument('--append', action='store_true', help='add the grids to an existing grid file')
+    unpack = commands.add_parser('unpack', help='write the grids of a grid file as puzzle lines')
+    unpack.add_argument('path', help='path to the grid file')
+    unpack.add_argument('out_path', nargs='?', default='-', help='path to the puzzle line file (default stdout)')
+    get = commands.add_parser('get', help='write grid k of a grid file as CSV')
+    get.add_argument('path', help='path to the grid file')
+    get.add_argument('index', type=int, help='index of the grid, from 0')
+    get.add_argument('out_path', nargs='?', help='path to the CSV file (default stdout)')
+    return parser.parse_args(argv)
+
+
+def cell_bits(size):
+    """
+    Bits per cell of a grid with size rows: enough for the digit size
+    """
+    return 4 if size < 16 else 5
+
+
+def record_bytes(size):
+    """
+    Bytes per record of a grid with size rows
+    """
+    return (size * size * cell_bits(size) + 7) // 8
+
+
+def pack_grid(matrix):
+    """
+    Packs a matrix into one record
+    """
+    size = len(matrix)
+    bits = cell_bits(size)
+    packed = 0
+    shift = 0
+    for row in matrix:
+        for val in row:
+            packed |= val << shift
+            shift += bits
+    return packed.to_bytes(record_bytes(size), 'little')
+
+
+def unpack_grid(record, size):
+    """
+    Unpacks one record into a matrix with size rows
+    """
+    if size < 16:
+        cells = [val for byte in record for val in NIBBLES[byte]]
+    else:
+        packed = int.from_bytes(record, 'little')
+        cells = [(packed >> (5 * c)) & 0x1F for c in range(size * size)]
+    return [cells[i * size:i * size + size] for i in range(size)]
+
+
+def write_grids(out_path, matrices, append=False):
+    """
+    Writes the matrices, all of the same size, to a new grid file and
+    returns the number written. matrices can be any iterable, so grids
+    are packed as they are read. With append, the matrices are added to
+    the end of an existing grid file, which must hold grids of the same
+    size; a missing file is created.
+    """
+    count = 0
+    size = None
+    if append and os.path.exists(out_path) and os.path.getsize(out_path) > 0:
+        size = _check_header(out_path)
+    with open(out_path, 'ab' if size is not None else 'wb') as f:
+        for matrix in matrices:
+            if size is None:
+                size = len(matrix)
+                assert box_size_of(size) is not None, 'Grids do not have 4, 9, 16 or 25 rows'
+                f.write(HEADER.pack(MAGIC, VERSION, size, cell_bits(size)))
+            assert len(matrix) == size and all(len(row) == size for row in matrix), \
+                'All grids of a grid file should be {0}x{0}'.format(size)
+            assert all(0 <= val <= size for row in matrix for val in row), \
+                'Grid has a value outside 0 to {}'.format(size)
+            f.write(pack_grid(matrix))
+            count += 1
+    return count
+
+
+def parse_header(header):
+    """
+    Returns the grid size given by the header of a grid file, or None if
+    header is not a valid one
+    """
+    if len(header) < HEADER.size:
+        return None
+    (magic, version, size, bits) = HEADER.unpack_from(header, 0)
+    if magic != MAGIC or version != VERSION or box_size_of(size) is None or bits != cell_bits(size):
+        return None
+    return size
+
+
+def _check_header(path):
+    """
+    Returns the grid size of the grid file at path, which should end
+    with a whole record
+    """
+    with open(path, 'rb') as f:
+        size = parse_header(f.read(HEADER.size))
+    if size is None or (os.path.getsize(path) - HEADER.size) % record_bytes(size) != 0:
+        raise ValueError('Not a grid file: {}'.format(path))
+    return size
+
+
+def read_grids(path):
+    """
+    Yields the matrices of a CSV file (.csv) or a file of puzzle lines
+    """
+    if path.endswith('.csv'):
+        return read_csv_grids(path)
+    return read_puzzle_grids(path)
+
+
+def read_puzzle_grids(path):
+    """
+    Yields the matrices of a file of puzzle lines ('-' for stdin)
+    """
+    stream = streamio.open_input(path)
+    try:
+        for line in streamio.read_puzzle_lines(stream):
+            yield batch.parse_puzzle(line)
+    finally:
+        streamio.close(stream)
+
+
+def read_csv_grids(path):
+    """
+    Yields the matrices of a CSV file of one or more grids
+    """
+    with open(path, 'r') as f:
+        for matrix in streamio.read_csv_matrices(f):
+            yield matrix
+
+
+class GridFile(object):
+    """
+    Memory-mapped grid file. len() is the number of grids, grids[k] is
+    grid k as a matrix (negative k counts from the end), and iterating
+    yields every grid. grids(start, stop) yields a range of grids, e.g.
+    the shard of one worker.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            # nothing was packed, so there is no header and no grid size
+            self.map = None
+            self.size = None
+            self.count = 0
+            return
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError('Not a grid file: {}'.format(path))
+        self.size = parse_header(self.map[:HEADER.size])
+        if self.size is None:
+            self.close()
+            raise ValueError('Not a grid file: {}'.format(path))
+        self.record_bytes = record_bytes(self.size)
+        self.count = (len(self.map) - HEADER.size) // self.record_bytes
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError('Grid index out of range: {}'.format(k))
+        start = HEADER.size + k * self.record_bytes
+        return unpack_grid(self.map[start:start + self.record_bytes], self.size)
+
+    def __iter__(self):
+        return self.grids()
+
+    def grids(self, start=0, stop=None):
+        stop = self.count if stop is None else min(stop, self.count)
+        for k in range(start, stop):
+            yield self[k]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+if __name__ == "__main__":
+    main()
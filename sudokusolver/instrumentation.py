@@ -0,0 +1,158 @@
+"""
+This module contains the per-phase instrumentation of the Sudoku
+solver. A run is split into phases (load, validate, propagate, search,
+write and render); each phase is timed with a nanosecond counter and,
+when given a tracing.SolveStats, counts the nodes and backtracks of
+the search that happened during the phase.
+
+Every finished phase becomes one record, a dict such as
+{"phase": "search", "ns": 1834000, "nodes": 412, "backtracks": 391},
+which is passed to a callback and/or written to a stream as a JSON
+line. Two optional capture modes help attribute a regression to a
+phase: cProfile, with one profile per phase saved to
+<profile_dir>/<phase>.prof, and tracemalloc, which adds the memory
+allocated by the phase. json, cProfile and tracemalloc are only
+imported when a run is instrumented, so importing this module costs
+solver-only runs nothing.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import os
+import time
+
+now_ns = time.perf_counter_ns
+
+PHASES = ('load', 'validate', 'propagate', 'search', 'write', 'render')
+
+
+class Instrumentation(object):
+    """
+    Times the phases of a run and emits one record per phase to callback
+    and/or as a JSON line to stream. The items of context (e.g. the puzzle
+    being solved) are added to every record. totals holds, per phase, the
+    number of runs and the summed ns, nodes and backtracks.
+    """
+
+    def __init__(self, callback=None, stream=None, profile_dir=None, trace_memory=False, context=None):
+        self.callback = callback
+        self.stream = stream
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.context = dict(context or {})
+        self.totals = {}
+        self.profiles = {}
+        self.tracemalloc = None
+        if trace_memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def phase(self, name, stats=None):
+        """
+        Returns a context manager that times the phase called name.
+        Node and backtrack counts are taken from stats, if given.
+        """
+        return _Phase(self, name, stats)
+
+    def emit(self, record):
+        total = self.totals.setdefault(record['phase'], {'runs': 0, 'ns': 0, 'nodes': 0, 'backtracks': 0})
+        total['runs'] += 1
+        for key in ('ns', 'nodes', 'backtracks'):
+            total[key] += record[key]
+        if self.callback is not None:
+            self.callback(record)
+        if self.stream is not None:
+            import json
+            self.stream.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def save_profiles(self):
+        """
+        Writes the cProfile data of each phase to <profile_dir>/<phase>.prof
+        and returns the paths written
+        """
+        paths = []
+        if self.profile_dir is None:
+            return paths
+        if not os.path.isdir(self.profile_dir):
+            os.makedirs(self.profile_dir)
+        for (name, profile) in sorted(self.profiles.items()):
+            path = os.path.join(self.profile_dir, name + '.prof')
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+class _Phase(object):
+    """
+    A phase being timed. Used through Instrumentation.phase in a with statement.
+    """
+
+    def __init__(self, instrumentation, name, stats):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.stats = stats
+
+    def __enter__(self):
+        instrumentation = self.instrumentation
+        if self.stats is not None:
+            self.nodes = self.stats.nodes
+            self.backtracks = self.stats.backtracks
+        if instrumentation.trace_memory:
+            tracemalloc = instrumentation.tracemalloc
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.profile = None
+        if instrumentation.profile_dir is not None:
+            import cProfile
+            self.profile = instrumentation.profiles.setdefault(self.name, cProfile.Profile())
+            self.profile.enable()
+        self.start = now_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = now_ns() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+        record = dict(self.instrumentation.context)
+        record['phase'] = self.name
+        record['ns'] = elapsed
+        record['nodes'] = 0
+        record['backtracks'] = 0
+        if self.stats is not None:
+            record['nodes'] = self.stats.nodes - self.nodes
+            record['backtracks'] = self.stats.backtracks - self.backtracks
+        if self.instrumentation.trace_memory:
+            (current, peak) = self.instrumentation.tracemalloc.get_traced_memory()
+            record['memory_bytes'] = current - self.memory
+            record['peak_bytes'] = peak - self.memory
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.instrumentation.emit(record)
+        return False
+
+
+class _NoPhase(object):
+    """
+    Context manager that does nothing, for runs without instrumentation
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class NoInstrumentation(object):
+    """
+    Stand-in for Instrumentation that records nothing
+    """
+    _no_phase = _NoPhase()
+
+    def phase(self, name, stats=None):
+        return self._no_phase
+
+
+NO_INSTRUMENTATION = NoInstrumentation()
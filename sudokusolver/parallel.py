@@ -0,0 +1,190 @@
+"""
+This module solves files of Sudoku puzzles on all cores. The puzzle
+lines are split into chunks that are handed to a pool of worker
+processes, and the results are written in input order, in the same
+format as batch.py. Input and output are streamed through streamio
+and latencies are kept in a fixed-size histogram, so memory use does
+not grow with the number of puzzles. A per-puzzle timeout stops a worker from spending
+too long on a single pathological puzzle. The timeout uses SIGALRM,
+so it is only enforced on platforms that have it.
+
+Usage: python -m sudokusolver.parallel </path/to/puzzles.txt|-> [</path/to/output.txt|->]
+           [--strategy <name>] [--processes <n>] [--chunksize <n>] [--timeout <secs>]
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import time
+import sys
+import math
+import signal
+import argparse
+import multiprocessing
+
+from . import sudokusolver as solver
+from . import batch
+from . import streamio
+
+
+class PuzzleTimeout(Exception):
+    pass
+
+
+def main():
+    """
+    Main method for parallel batch solving. Prints throughput and latency.
+    """
+    args = parse_arguments(sys.argv[1:])
+    out_path = args.out_path or batch.output_path(args.path)
+    summary = solve_parallel(args.path, out_path, args.strategy, args.processes, args.chunksize, args.timeout)
+    # keep the summary out of the solutions when they go to stdout
+    out = sys.stderr if out_path == '-' else sys.stdout
+    out.write('=========== Parallel ============\n')
+    out.write('Puzzles:     {}\n'.format(summary['puzzles']))
+    for status in sorted(summary['counts']):
+        out.write('  {:<10} {}\n'.format(status, summary['counts'][status]))
+    out.write('Total time:  {:.4f} secs\n'.format(summary['secs']))
+    out.write('Throughput:  {:.1f} puzzles/sec\n'.format(summary['throughput']))
+    out.write('Latency p50: {:.6f} secs\n'.format(summary['p50']))
+    out.write('Latency p99: {:.6f} secs\n'.format(summary['p99']))
+    out.write('Output:      {}\n'.format(out_path))
+    out.write('=================================\n')
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    parser = argparse.ArgumentParser(description='Solve a file of Sudoku puzzles on all cores.')
+    parser.add_argument('path', help='path to the puzzle file')
+    parser.add_argument('out_path', nargs='?', help='path to the output file')
+    parser.add_argument('--strategy', default='propagate', choices=solver.STRATEGIES,
+                        help='search strategy used to solve the puzzles')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=64, help='number of puzzles sent to a worker at once')
+    parser.add_argument('--timeout', type=float, default=None, help='maximum seconds spent on a puzzle')
+    return parser.parse_args(argv)
+
+
+def solve_parallel(path, out_path, strategy='propagate', processes=None, chunksize=64, timeout=None):
+    """
+    Solves every puzzle in path with a pool of processes and writes the
+    results to out_path in input order. Returns a summary with the number
+    of puzzles, the counts per status, the total time, the throughput in
+    puzzles per second and the p50 and p99 latencies.
+    """
+    counts = {}
+    latencies = LatencyHistogram()
+    in_stream = streamio.open_input(path)
+    out_stream = streamio.open_output(out_path)
+    pool = multiprocessing.Pool(processes, initializer=_init_worker)
+    ts = time.time()
+    try:
+        tasks = ((line, strategy, timeout) for line in streamio.read_puzzle_lines(in_stream))
+        results = pool.imap(_solve_line, tasks, chunksize)
+        streamio.write_lines(out_stream, _format_results(results, counts, latencies))
+    finally:
+        pool.close()
+        pool.join()
+        streamio.close(out_stream)
+        streamio.close(in_stream)
+    elapsed = time.time() - ts
+    return {'puzzles': latencies.total, 'counts': counts, 'secs': elapsed,
+            'throughput': latencies.total / elapsed if elapsed > 0 else 0.0,
+            'p50': latencies.percentile(50), 'p99': latencies.percentile(99)}
+
+
+def _format_results(results, counts, latencies):
+    for (solution, status, secs, nodes) in results:
+        counts[status] = counts.get(status, 0) + 1
+        latencies.add(secs)
+        yield batch.format_result(solution, status, secs, nodes)
+
+
+class LatencyHistogram(object):
+    """
+    Constant-memory latency recorder. Latencies are counted in buckets
+    whose bounds grow by GROWTH, starting at MIN_SECS, so percentiles are
+    reported as the upper bound of a bucket, within 5% of the true value.
+    """
+    MIN_SECS = 1e-6
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    def add(self, secs):
+        bucket = int(math.ceil(math.log(max(secs, self.MIN_SECS) / self.MIN_SECS, self.GROWTH)))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+
+    def percentile(self, p):
+        """
+        Nearest-rank percentile of the recorded latencies
+        """
+        if self.total == 0:
+            return 0.0
+        rank = max(int(math.ceil(p / 100.0 * self.total)), 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return self.MIN_SECS * self.GROWTH ** bucket
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(p / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def _init_worker():
+    # let the parent handle Ctrl-C, and turn SIGALRM into PuzzleTimeout
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def _raise_timeout(signum, frame):
+    raise PuzzleTimeout()
+
+
+def _disarm_alarm():
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    except PuzzleTimeout:
+        # the alarm went off while it was being disarmed
+        pass
+
+
+def _solve_line(task):
+    """
+    Worker function. Solves one puzzle line with batch.solve_one and
+    returns (solution, status, secs, nodes).
+    """
+    (line, strategy, timeout) = task
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer')
+    ts = time.time()
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        [solved_matrix, status, secs, nodes] = batch.solve_one(line, strategy)
+        if use_alarm:
+            _disarm_alarm()
+    except PuzzleTimeout:
+        # the alarm is one-shot, so there is nothing left to disarm
+        return ('', 'timeout', time.time() - ts, 0)
+    except Exception:
+        if use_alarm:
+            _disarm_alarm()
+        raise
+    solution = batch.format_puzzle(solved_matrix) if solved_matrix is not None else ''
+    return (solution, status, secs, nodes)
+
+
+if __name__ == "__main__":
+    main()
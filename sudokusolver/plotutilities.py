@@ -3,167 +3,246 @@ This module contains the functions needed to graphically display
 the solution to Sudoku puzzle. This module depends on matplotlib
 library. The graphical output displays the cell evaluated in each
 iteration, time taken to solve and shades the cells based on difficulty.
+
+Figures are drawn by SolutionRenderer, which builds the axes, grid
+lines, colorbar and text artists once and only updates them for each
+puzzle. The difficulty shading of all cells is a single image. In
+headless mode the figure is drawn on the non-interactive Agg canvas
+and pyplot is never imported, so rendering works without a display
+and never blocks. The parts of a headless figure that are the same
+for every puzzle are drawn once and kept as a background image; each
+render restores it and draws only the artists that changed, so one
+renderer can write many solution images quickly.
 """
 
 __author__ = 'krishnakumarramamoorthy'
 
 import time
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patch
+import numpy
+from matplotlib import cm
+from matplotlib import image
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-import xumpy as np
+from . import xumpy as np
+from .geometry import SIZE, BOX_SIZE, geometry_of
 
 
-def visualize_solution(input_matrix, solved_matrix, graph, zero_indices, ts, out_path, time_to_solution):
+def visualize_solution(input_matrix, solved_matrix, stats, zero_indices, ts, out_path, time_to_solution,
+                       headless=False):
     """
     Plotting function that takes sudoku solution and intermediate data
     and plots them. It create three axes, one for plotting the progress,
     one for printing the summary metrics, and one for solved sudoku.
+    The figure is saved to out_path and, unless headless, shown.
     """
-    # prepare figure window for plotting
-    plt.figure().patch.set_facecolor('white')
-    plt.suptitle('Sudoku Solver\n', fontsize=20, color=plt.cm.Blues(0.9))
-
-    # plot the performance: number of iterations vs. numbers filled
-    ax1 = plt.subplot2grid((20, 3), (1, 0), rowspan=17, colspan=2)
-    [x, y, ylabels, eval_histogram, n] = generate_progress_data(graph, zero_indices)
-    max_eval_per_cell = max(eval_histogram)
-    total_iterations = n
-    plot_decorate_performance_data(ax1, x, y, ylabels)
-
-    # work on sudoku box area
-    ax2 = plt.subplot2grid((20, 3), (10, 2), rowspan=10, colspan=1)
-    create_colorbar(ax2, max_eval_per_cell)
-    decorate_sudoku_box(ax2)
-    fill_numbers(ax2, input_matrix, solved_matrix)
-    shade_cell_by_difficulty(ax2, zero_indices, eval_histogram, max_eval_per_cell)
-
-    # work on statistics area
-    ax3 = plt.subplot2grid((20, 3), (1, 2), rowspan=7, colspan=1)
-    time_to_plot = time.time() - ts
-    write_statistics(ax3, time_to_solution, time_to_plot, total_iterations)
-
-    # save figure and show
-    plt.savefig(out_path)
-    plt.show()
-
-
-def generate_progress_data(graph, zero_indices):
-    """
-    Generate data for plotting the number of evaluations and cell being evaluated
-    """
-    counter = 0
-    n = 0
-    eval_histogram = [0] * len(zero_indices[0])
-    ylabels = []
-    x = []
-    y = []
-    for n in range(len(graph['index'])):
-        y.append(graph['index'][n][1])
-        eval_histogram[graph['index'][n][1]] += 1
-        ylabels.append('[{},{}]'.format(zero_indices[0][graph['index'][n][1]] + 1,
-                                        zero_indices[1][graph['index'][n][1]] + 1))
-        x.append(counter)
-        counter += 1
-    return [x, y, ylabels, eval_histogram, n]
+    if headless:
+        renderer = SolutionRenderer()
+    else:
+        import matplotlib.pyplot as plt
+        renderer = SolutionRenderer(plt.figure())
+    renderer.render(input_matrix, solved_matrix, stats, zero_indices, ts, out_path, time_to_solution)
+    if not headless:
+        plt.show()
 
 
-def plot_decorate_performance_data(ax1, x, y, ylabels):
+class SolutionRenderer(object):
     """
-    Modify the objects in performance plot. Add labels, resize font, etc.
+    Reusable figure template for solution plots. Without a figure, an
+    off-screen figure on the Agg canvas is created.
     """
-    ax1.plot(x, y)
-    ax1.set_title('Progress', fontsize=11, color='black', alpha=0.9)
-    plt.xlabel('How long did it take to solve? \n (Number of Evaluations)', fontsize=10)
-    plt.ylabel('Which cell was evaluated? (Unfilled Cell Index)', fontsize=10)
-    # label the y-axis with the cell location in sudoku grid
-    plt.yticks(y, ylabels, color='gray', fontsize=8)
-    plt.xticks(color='gray')
 
+    def __init__(self, figure=None):
+        # only an off-screen figure is drawn over a cached background
+        self.blit = figure is None
+        if figure is None:
+            figure = Figure()
+            FigureCanvasAgg(figure)
+        self.figure = figure
+        self.size = None
+        self.background = None
 
-def create_colorbar(ax2, max_eval_per_cell):
-    """
-    Create a color index for the colors used to show difficulty of cells in sudoku grid
-    """
-    # create a temporary imshow and use it to create a colorbar, then remove the imshow object
-    data = np.randn(10, 10, max_eval_per_cell)
-    cax = plt.imshow(data, interpolation='nearest', cmap=plt.cm.Blues)
-    cbar = plt.colorbar(cax, orientation='horizontal', ticks=[])
-    cbar.solids.set_edgecolor(None)
-    cbar.ax.set_xlabel('How difficult was it to solve?\n(Easy - - - > Difficult)', fontsize=10)
-    # clear dummy imshow plot; anything plotted before in ax2 won't persist. cbar is on its own axes
-    ax2.cla()
+    def render(self, input_matrix, solved_matrix, stats, zero_indices, ts, out_path, time_to_solution):
+        """
+        Draws the solution and its statistics and saves the figure to out_path
+        """
+        geometry = geometry_of(solved_matrix)
+        if self.size != geometry.size:
+            self._build(geometry.size, geometry.box_size)
+        [x, y, ylabels, eval_histogram, n] = generate_progress_data(stats, zero_indices)
+        # puzzles solved by propagation alone have no evaluations
+        max_eval_per_cell = max(max(eval_histogram), 1)
+        self._draw_progress(x, y, ylabels)
+        self._fill_numbers(input_matrix, solved_matrix)
+        self._shade_cells_by_difficulty(geometry, zero_indices, eval_histogram, max_eval_per_cell)
+        time_to_plot = time.time() - ts
+        self._write_statistics(time_to_solution, time_to_plot, n)
+        if not self.blit:
+            self.figure.savefig(out_path)
+            return
+        canvas = self.figure.canvas
+        if self.background is None:
+            # draw everything but the animated artists once
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.figure.bbox)
+        canvas.restore_region(self.background)
+        for artist in self.dynamic_artists:
+            self.figure.draw_artist(artist)
+        if not out_path.endswith('.png'):
+            out_path += '.png'
+        image.imsave(out_path, numpy.asarray(canvas.buffer_rgba()))
 
+    def _build(self, size, box_size):
+        """
+        Creates the axes and every artist that does not depend on the puzzle
+        """
+        figure = self.figure
+        figure.clear()
+        self.size = size
+        self.background = None
+        figure.patch.set_facecolor('white')
+        figure.suptitle('Sudoku Solver\n', fontsize=20, color=cm.Blues(0.9))
+        grid = GridSpec(20, 3)
 
-def decorate_sudoku_box(ax2):
-    """
-    Modify line and color properties of sudoku grid to make it look good
-    """
-    [x, y, xr, yr] = generate_sudoku_box_lines()
-    ax2.set_title('Solution\n\n', fontsize=11, color='black', alpha=0.9)
-    ax2.plot(x, y, color='gray')
-    ax2.plot(xr, yr, color='gray', linewidth=2)
-    # move the x tick to top
-    ax2.xaxis.tick_top()
-    # turn off the tick markers
-    ax2.tick_params(bottom='off', top='off', left='off', right='off')
-    # rewrite the tick labels so that they are aligned at the center of each box and not at the border
-    plt.xticks(np.arange(0.5, 9.5, 1), np.arange(1, 10, 1), color='gray', fontsize=8)
-    # start numbering y labels from the top
-    plt.yticks(np.arange(0.5, 9.5, 1), np.arange(1, 10, 1), color='gray', fontsize=8)
-
-
-def fill_numbers(ax2, input_matrix, solved_matrix):
-    # fill the numbers
-    for i in range(9):
-        for j in range(9):
-            # quirk: when plotting matrix, transpose it; i is in y-axis and j is in x-axis
+        # the performance: number of iterations vs. numbers filled
+        self.ax1 = figure.add_subplot(grid[1:18, 0:2])
+        self.ax1.set_title('Progress', fontsize=11, color='black', alpha=0.9)
+        self.ax1.set_xlabel('How long did it take to solve? \n (Number of Evaluations)', fontsize=10)
+        self.ax1.set_ylabel('Which cell was evaluated? (Unfilled Cell Index)', fontsize=10)
+        self.ax1.tick_params(axis='x', colors='gray')
+        [self.progress_line] = self.ax1.plot([], [])
+
+        # sudoku box area
+        self.ax2 = figure.add_subplot(grid[10:20, 2])
+        self._create_colorbar()
+        self._decorate_sudoku_box(size, box_size)
+        # all shading is one image; clues are NaN, which is drawn transparent
+        self.shading = self.ax2.imshow([[float('nan')] * size for _ in range(size)], cmap=cm.Blues,
+                                       norm=Normalize(0, 1), alpha=0.5, interpolation='nearest',
+                                       extent=(0, size, size, 0), zorder=0)
+        fontsize = min(10, 90.0 / size)
+        self.numbers = [self.ax2.text(j + 0.5, i + 0.5, '', horizontalalignment='center',
+                                      verticalalignment='center', fontsize=fontsize)
+                        for i in range(size) for j in range(size)]
+        self.ax2.set_xlim(0, size)
+        # start numbering rows from the top
+        self.ax2.set_ylim(size, 0)
+
+        # statistics area
+        self.ax3 = figure.add_subplot(grid[1:8, 2])
+        self._decorate_statistics()
+
+        # the progress plot is redrawn whole, since its ticks change with the puzzle
+        self.dynamic_artists = [self.ax1, self.shading] + self.numbers + self.statistics
+        if self.blit:
+            for artist in self.dynamic_artists:
+                artist.set_animated(True)
+
+    def _create_colorbar(self):
+        """
+        Create a color index for the colors used to show difficulty of cells in sudoku grid
+        """
+        mappable = cm.ScalarMappable(norm=Normalize(0, 1), cmap=cm.Blues)
+        mappable.set_array([])
+        cbar = self.figure.colorbar(mappable, ax=self.ax2, orientation='horizontal', ticks=[])
+        cbar.solids.set_edgecolor(None)
+        cbar.ax.set_xlabel('How difficult was it to solve?\n(Easy - - - > Difficult)', fontsize=10)
+
+    def _decorate_sudoku_box(self, size, box_size):
+        """
+        Modify line and color properties of sudoku grid to make it look good
+        """
+        ax2 = self.ax2
+        [x, y, xr, yr] = generate_sudoku_box_lines(size, box_size)
+        ax2.set_title('Solution\n\n', fontsize=11, color='black', alpha=0.9)
+        ax2.plot(x, y, color='gray')
+        ax2.plot(xr, yr, color='gray', linewidth=2)
+        # move the x tick to top
+        ax2.xaxis.tick_top()
+        # turn off the tick markers
+        ax2.tick_params(length=0)
+        # place the tick labels at the center of each box and not at the border
+        ax2.set_xticks(np.arange(0.5, size + 0.5, 1))
+        ax2.set_xticklabels(np.arange(1, size + 1, 1), color='gray', fontsize=8)
+        ax2.set_yticks(np.arange(0.5, size + 0.5, 1))
+        ax2.set_yticklabels(np.arange(1, size + 1, 1), color='gray', fontsize=8)
+
+    def _decorate_statistics(self):
+        ax3 = self.ax3
+        ax3.get_xaxis().set_visible(False)
+        ax3.get_yaxis().set_visible(False)
+        for side in ('left', 'right', 'top', 'bottom'):
+            ax3.spines[side].set_color('white')
+        self.statistics = []
+        for (top, label) in ((0.9, 'Time to solution'), (0.6, 'Time to plot'), (0.3, 'Number of evaluations')):
+            self.statistics.append(ax3.text(0.5, top, '', horizontalalignment='center',
+                                            verticalalignment='center', fontsize=16))
+            ax3.text(0.5, top - 0.05, label, horizontalalignment='center', verticalalignment='center',
+                     fontsize=12, color='gray')
+
+    def _draw_progress(self, x, y, ylabels):
+        """
+        Updates the performance plot
+        """
+        self.progress_line.set_data(x, y)
+        self.ax1.relim()
+        self.ax1.autoscale_view()
+        # label the y-axis with the cell location in sudoku grid, once per cell
+        ticks = dict(zip(y, ylabels))
+        positions = sorted(ticks)
+        self.ax1.set_yticks(positions)
+        self.ax1.set_yticklabels([ticks[p] for p in positions], color='gray', fontsize=8)
+
+    def _fill_numbers(self, input_matrix, solved_matrix):
+        for (c, (i, j)) in enumerate(geometry_of(solved_matrix).coords):
+            text = self.numbers[c]
+            text.set_text(str(solved_matrix[i][j]))
             if input_matrix[i][j] == 0:
-                ax2.text(j + 0.5, i + 0.5, solved_matrix[i][j], horizontalalignment='center',
-                         verticalalignment='center', color='black', fontsize=10)
+                text.set_color('black')
+                text.set_alpha(1.0)
             else:
-                ax2.text(j + 0.5, i + 0.5, solved_matrix[i][j], horizontalalignment='center',
-                         verticalalignment='center', color='gray', alpha=0.7, fontsize=10)
+                text.set_color('gray')
+                text.set_alpha(0.7)
+
+    def _shade_cells_by_difficulty(self, geometry, zero_indices, eval_histogram, max_eval_per_cell):
+        """
+        Shade the unfilled cells in sudoku box with a color representing
+        difficulty. Difficulty is defined as number of times that cell
+        was evaluated.
+        """
+        shade = [float('nan')] * len(geometry.cells)
+        for (position, (i, j)) in enumerate(zip(zero_indices[0], zero_indices[1])):
+            shade[i * geometry.size + j] = eval_histogram[position] * 1.0 / max_eval_per_cell
+        self.shading.set_data([[shade[c] for c in cells] for cells in geometry.row_cells])
+
+    def _write_statistics(self, time_to_solution, time_to_plot, total_iterations):
+        [solution, plot, iterations] = self.statistics
+        solution.set_text('{:.2f} secs\n'.format(time_to_solution))
+        plot.set_text('{:.2f} secs\n'.format(time_to_plot))
+        iterations.set_text('{} \n'.format(total_iterations))
 
 
-def shade_cell_by_difficulty(ax2, zero_indices, eval_histogram, max_eval_per_cell):
+def generate_progress_data(stats, zero_indices):
     """
-    Shade the unfilled cells in sudoku box with a color representing
-    difficulty. Difficulty is defined as number of times that cell
-    was evaluated.
+    Generate data for plotting the number of evaluations and cell being evaluated.
+    stats is a tracing.SolveStats: the progress plot shows the nodes it kept
+    (all, sampled or the latest ones) and the histogram covers every node.
     """
-    # fill the background with difficulty metric
-    for c in range(len(zero_indices[0])):
-        i = zero_indices[0][c]
-        j = zero_indices[1][c]
-        # quirk: when plotting matrix, transpose it; i is in y-axis and j is in x-axis
-        ax2.add_patch(patch.Rectangle((j, i), 1, 1, facecolor=plt.cm.Blues(eval_histogram[c] * 1.0 / max_eval_per_cell),
-                                      alpha=0.5))
-
-
-def write_statistics(ax3, time_to_solution, time_to_plot, total_iterations):
-    ax3.get_xaxis().set_visible(False)
-    ax3.get_yaxis().set_visible(False)
-    ax3.spines['left'].set_color('white')
-    ax3.spines['right'].set_color('white')
-    ax3.spines['top'].set_color('white')
-    ax3.spines['bottom'].set_color('white')
-    ax3.text(0.5, 0.9, '{:.2f} secs\n'.format(time_to_solution),
-             horizontalalignment='center', verticalalignment='center', fontsize=16)
-    ax3.text(0.5, 0.85, 'Time to solution', horizontalalignment='center', verticalalignment='center',
-             fontsize=12, color='gray')
-    ax3.text(0.5, 0.6, '{:.2f} secs\n'.format(time_to_plot), horizontalalignment='center',
-             verticalalignment='center', fontsize=16)
-    ax3.text(0.5, 0.55, 'Time to plot', horizontalalignment='center', verticalalignment='center',
-             fontsize=12, color='gray')
-    ax3.text(0.5, 0.3, '{} \n'.format(total_iterations), horizontalalignment='center',
-             verticalalignment='center', fontsize=16)
-    ax3.text(0.5, 0.25, 'Number of evaluations', horizontalalignment='center', verticalalignment='center',
-             fontsize=12, color='gray')
-
-
-def generate_sudoku_box_lines():
+    ylabels = []
+    x = []
+    y = []
+    for (node, prev_position, position, prev_value, value) in stats.trace():
+        x.append(node)
+        y.append(position)
+        ylabels.append('[{},{}]'.format(zero_indices[0][position] + 1, zero_indices[1][position] + 1))
+    eval_histogram = stats.evaluations(len(zero_indices[0]))
+    return [x, y, ylabels, eval_histogram, stats.nodes]
+
+
+def generate_sudoku_box_lines(size=SIZE, box_size=BOX_SIZE):
     # lines for cells
     x = []
     y = []
@@ -172,36 +251,35 @@ def generate_sudoku_box_lines():
     yr = []
 
     # data for vertical lines
-    for i in range(9):
+    for i in range(size):
         x.append(i)
         x.append(i)
         y.append(0)
-        y.append(9)
+        y.append(size)
         x.append(None)
         y.append(None)
-        if divmod(i, 3)[1] == 0:
+        if divmod(i, box_size)[1] == 0:
             xr.append(i)
             xr.append(i)
             yr.append(0)
-            yr.append(9)
+            yr.append(size)
             xr.append(None)
             yr.append(None)
 
     # data for horizontal lines
-    for j in range(9):
+    for j in range(size):
         x.append(0)
-        x.append(9)
+        x.append(size)
         y.append(j)
         y.append(j)
         x.append(None)
         y.append(None)
-        if divmod(j, 3)[1] == 0:
+        if divmod(j, box_size)[1] == 0:
             xr.append(0)
-            xr.append(9)
+            xr.append(size)
             yr.append(j)
             yr.append(j)
             xr.append(None)
             yr.append(None)
 
     return [x, y, xr, yr]
-
@@ -0,0 +1,86 @@
+"""
+This module contains the constraint propagation used by the Sudoku
+solver. It fills cells that can be deduced without guessing:
+naked singles (a cell with only one candidate left) and hidden
+singles (a digit that fits in only one cell of a row, column or
+region). Cells filled by propagation are recorded on a trail so that
+the search can undo them when it backtracks.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+from .constraints import BITS, MAX_DIGIT
+
+# digit for each mask with a single bit set
+SINGLE_DIGIT = dict((BITS[n], n) for n in range(1, MAX_DIGIT + 1))
+
+
+def propagate(matrix, state, trail):
+    """
+    Fills naked and hidden singles until no more can be found. Each filled
+    cell is appended to trail as a (row, col) tuple. Returns the number of
+    cells filled, or None if some cell or unit can no longer be completed.
+    """
+    geometry = state.geometry
+    filled = 0
+    progress = True
+    while progress:
+        progress = False
+        # naked singles
+        for (i, j) in geometry.coords:
+            if matrix[i][j] == 0:
+                mask = state.candidates(i, j)
+                if mask == 0:
+                    return None
+                if mask in SINGLE_DIGIT:
+                    place(matrix, state, trail, i, j, SINGLE_DIGIT[mask])
+                    filled += 1
+                    progress = True
+        # hidden singles
+        for unit in geometry.unit_coords:
+            used = 0
+            once = 0
+            twice = 0
+            for (i, j) in unit:
+                if matrix[i][j] != 0:
+                    used |= BITS[matrix[i][j]]
+                else:
+                    mask = state.candidates(i, j)
+                    twice |= once & mask
+                    once |= mask
+            missing = geometry.all_digits & ~used
+            if missing & ~once:
+                # a digit missing from the unit has no cell left
+                return None
+            hidden = missing & once & ~twice
+            if hidden == 0:
+                continue
+            for (i, j) in unit:
+                if matrix[i][j] == 0:
+                    mask = state.candidates(i, j) & hidden
+                    if mask:
+                        if mask not in SINGLE_DIGIT:
+                            # the only cell for two digits
+                            return None
+                        place(matrix, state, trail, i, j, SINGLE_DIGIT[mask])
+                        filled += 1
+                        progress = True
+    return filled
+
+
+def place(matrix, state, trail, i, j, n):
+    """
+    Fills cell[i][j] with n and records it on the trail
+    """
+    matrix[i][j] = n
+    state.place(i, j, n)
+    trail.append((i, j))
+
+
+def undo(matrix, state, trail, mark):
+    """
+    Clears the cells recorded on the trail after position mark
+    """
+    while len(trail) > mark:
+        (i, j) = trail.pop()
+        state.remove(i, j, matrix[i][j])
+        matrix[i][j] = 0
@@ -0,0 +1,303 @@
+"""
+This module runs the Sudoku solver as a long-lived local service, so
+that callers do not pay the interpreter startup and imports of a
+command line run for every puzzle. The service is built on asyncio and
+has two front ends, which can be served together:
+
+    unix socket  one request per line and one JSON response per line;
+                 a connection can be kept open for many requests
+    HTTP         on localhost: POST /solve with the request as the
+                 JSON body, and GET /health for the service counters
+
+A request is a JSON object such as
+{"puzzle": "<81 characters>", "strategy": "dlx", "deadline": 2.5};
+only the puzzle is required, and on the unix socket a bare puzzle line
+is accepted too. Puzzles use the one-line format of batch.py. The
+response holds the status (solved, unsolvable, invalid, timeout, busy
+or error), the solution, the seconds taken and the nodes searched.
+error means the worker failed, e.g. because the pool broke, and is
+answered with HTTP 500.
+
+Puzzles are parsed and checked with validate_input as they arrive, so
+bad input is rejected without using a worker. Solving runs in a pool
+of worker processes, with at most one puzzle per worker at a time.
+Up to max_pending further requests wait for a worker; beyond that
+requests are answered 'busy' (HTTP 503) at once, so a flood of requests
+is pushed back to the clients instead of queueing without bound.
+Every request has a deadline, at most the service deadline: it is
+enforced in the worker with the SIGALRM timeout of parallel.py, and
+the service stops waiting for the worker shortly after it.
+
+Usage: python -m sudokusolver.service [--socket </path/to/socket>] [--port <n>] [--workers <n>]
+           [--max-pending <n>] [--deadline <secs>] [--strategy <name>]
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from . import sudokusolver as solver
+from . import batch
+from . import parallel
+
+# seconds the service waits for a worker after the deadline of a request
+GRACE = 0.5
+# largest HTTP request body accepted, in bytes
+MAX_BODY = 65536
+HTTP_STATUS = {'invalid': 400, 'error': 500, 'busy': 503, 'timeout': 504}
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+                504: 'Gateway Timeout'}
+
+
+def main():
+    """
+    Main method for the solving service. Serves until interrupted.
+    """
+    args = parse_arguments(sys.argv[1:])
+    if args.socket is None and args.port is None:
+        args.port = 8080
+    service = SolverService(args.workers, args.max_pending, args.deadline, args.strategy)
+    try:
+        asyncio.run(_serve_forever(service, args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    parser = argparse.ArgumentParser(description='Serve the Sudoku solver on a unix socket or localhost HTTP.')
+    parser.add_argument('--socket', help='path of the unix socket to listen on')
+    parser.add_argument('--port', type=int, help='localhost HTTP port to listen on (default 8080 without --socket)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--max-pending', type=int, default=64,
+                        help='requests that may wait for a worker before new ones are refused')
+    parser.add_argument('--deadline', type=float, default=10.0, help='longest time allowed for a request, in secs')
+    parser.add_argument('--strategy', default='propagate', choices=solver.STRATEGIES,
+                        help='default search strategy')
+    return parser.parse_args(argv)
+
+
+async def _serve_forever(service, socket_path, port):
+    servers = await serve(service, socket_path, port)
+    for server in servers:
+        for sock in server.sockets:
+            sys.stderr.write('Listening on {}\n'.format(sock.getsockname()))
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+async def serve(service, socket_path=None, port=None, host='127.0.0.1'):
+    """
+    Starts the service and its front ends: the line protocol on the unix
+    socket socket_path and HTTP on host:port (port 0 picks a free port).
+    Returns the asyncio servers.
+    """
+    service.start()
+    servers = []
+    if socket_path is not None:
+        servers.append(await asyncio.start_unix_server(service.handle_lines, path=socket_path))
+    if port is not None:
+        servers.append(await asyncio.start_server(service.handle_http, host, port))
+    return servers
+
+
+class SolverService(object):
+    """
+    Solves puzzle requests in a pool of worker processes. workers is the
+    number of processes (all cores by default), max_pending the number of
+    requests that may wait for a worker, deadline the default and largest
+    deadline of a request in seconds, and strategy the default strategy.
+    counts holds the number of responses with each status.
+    """
+
+    def __init__(self, workers=None, max_pending=64, deadline=10.0, strategy='propagate'):
+        assert strategy in solver.STRATEGIES, 'Unknown strategy: {}'.format(strategy)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.deadline = deadline
+        self.strategy = strategy
+        self.pool = None
+        self.slots = None
+        self.pending = 0
+        self.counts = {}
+
+    def start(self):
+        """
+        Starts the worker processes. Called from the event loop.
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=parallel._init_worker)
+            self.slots = asyncio.Semaphore(self.workers)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    async def solve(self, request):
+        """
+        Answers one request, given as a dict or a puzzle line, with a
+        response dict
+        """
+        response = await self._solve(request)
+        self.counts[response['status']] = self.counts.get(response['status'], 0) + 1
+        return response
+
+    async def _solve(self, request):
+        ts = time.time()
+        try:
+            (line, strategy, deadline) = self.parse_request(request)
+        except (AssertionError, ValueError, TypeError, KeyError, AttributeError) as e:
+            return _response('invalid', time.time() - ts, error=str(e))
+        if self.pending >= self.workers + self.max_pending:
+            return _response('busy', time.time() - ts)
+        self.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self.slots.acquire(), deadline)
+            except asyncio.TimeoutError:
+                return _response('timeout', time.time() - ts)
+            remaining = deadline - (time.time() - ts)
+            if remaining <= 0:
+                self.slots.release()
+                return _response('timeout', time.time() - ts)
+            try:
+                future = asyncio.get_running_loop().run_in_executor(self.pool, parallel._solve_line,
+                                                                    (line, strategy, remaining))
+            except Exception as e:
+                # a broken pool refuses new work
+                self.slots.release()
+                return _error_response(e, time.time() - ts)
+            # the worker is only free again once it has returned
+            future.add_done_callback(self._release)
+            try:
+                (solution, status, secs, nodes) = await asyncio.wait_for(asyncio.shield(future), remaining + GRACE)
+            except asyncio.TimeoutError:
+                return _response('timeout', time.time() - ts)
+            except Exception as e:
+                return _error_response(e, time.time() - ts)
+            return _response(status, time.time() - ts, solution, nodes)
+        finally:
+            self.pending -= 1
+
+    def _release(self, future):
+        self.slots.release()
+        if not future.cancelled():
+            # retrieve the outcome, so a failure after a timeout is not reported as unhandled
+            future.exception()
+
+    def parse_request(self, request):
+        """
+        Returns (puzzle line, strategy, deadline) for a request, after
+        checking the puzzle with validate_input
+        """
+        if not isinstance(request, dict):
+            request = {'puzzle': request}
+        line = request['puzzle'].strip()
+        solver.validate_input(batch.parse_puzzle(line))
+        strategy = request.get('strategy', self.strategy)
+        assert strategy in solver.STRATEGIES, 'Unknown strategy: {}'.format(strategy)
+        deadline = float(request.get('deadline', self.deadline))
+        assert math.isfinite(deadline) and deadline > 0, 'Deadline should be a positive number of seconds'
+        return (line, strategy, min(deadline, self.deadline))
+
+    def health(self):
+        return {'status': 'ok', 'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending,
+                'counts': dict(self.counts)}
+
+    async def handle_lines(self, reader, writer):
+        """
+        Line protocol of the unix socket: each line is a JSON request or a
+        bare puzzle line, answered with a JSON line
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode('utf-8', 'replace').strip()
+                if not text:
+                    continue
+                try:
+                    request = json.loads(text) if text.startswith('{') else text
+                except ValueError as e:
+                    response = _response('invalid', 0.0, error=str(e))
+                else:
+                    response = await self.solve(request)
+                writer.write((json.dumps(response, sort_keys=True) + '\n').encode('utf-8'))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle_http(self, reader, writer):
+        """
+        Minimal HTTP/1.1 front end: POST /solve and GET /health. Every
+        connection answers a single request.
+        """
+        try:
+            (code, body) = await self._http_request(reader)
+            payload = json.dumps(body, sort_keys=True).encode('utf-8')
+            head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n' \
+                   'Connection: close\r\n\r\n'.format(code, HTTP_REASONS[code], len(payload))
+            writer.write(head.encode('ascii') + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _http_request(self, reader):
+        """
+        Reads one HTTP request and returns (status code, response body)
+        """
+        try:
+            (method, path) = (await reader.readline()).decode('ascii').split()[:2]
+            length = 0
+            while True:
+                header = (await reader.readline()).decode('latin-1').strip()
+                if not header:
+                    break
+                (name, value) = header.split(':', 1)
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+        except (ValueError, UnicodeDecodeError):
+            return (400, {'status': 'invalid', 'error': 'Malformed HTTP request'})
+        if path == '/health':
+            return (200, self.health()) if method == 'GET' else (405, {'status': 'invalid'})
+        if path != '/solve':
+            return (404, {'status': 'invalid', 'error': 'Unknown path: {}'.format(path)})
+        if method != 'POST':
+            return (405, {'status': 'invalid'})
+        if length > MAX_BODY:
+            return (413, {'status': 'invalid', 'error': 'Request body too large'})
+        try:
+            request = json.loads((await reader.readexactly(length)).decode('utf-8'))
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            return (400, _response('invalid', 0.0, error=str(e)))
+        response = await self.solve(request)
+        return (HTTP_STATUS.get(response['status'], 200), response)
+
+
+def _response(status, secs, solution='', nodes=0, error=None):
+    response = {'status': status, 'solution': solution, 'secs': secs, 'nodes': nodes}
+    if error is not None:
+        response['error'] = error
+    return response
+
+
+def _error_response(exception, secs):
+    return _response('error', secs, error='{}: {}'.format(type(exception).__name__, exception))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+This module keeps a Sudoku grid open for interactive editing. A
+SolveSession holds the current grid with its used-digit masks and
+answers candidates, consistency and solution queries after each edit
+without starting over from load_input:
+
+    session = SolveSession(matrix)
+    session.set_cell((0, 1), 3)
+    session.candidates((4, 4))     # mask of digits, as in constraints.py
+    session.is_consistent()
+    session.solve()                # solved matrix, or None
+    session.clear_cell((0, 1))
+
+Edits update the row, column and region masks in constant time, with a
+count of every digit per unit so that repeated digits are tracked and
+undone exactly. Between edits the session keeps:
+
+    the last solution and the number of filled cells that disagree with
+    it. Clearing a cell never adds to the count and setting a cell only
+    does when the digit differs from the solution, so the solution is
+    reused whenever the count is back to 0, e.g. after an edit is undone
+
+    the grid with the singles propagated from it. Setting a cell only
+    removes candidates, so the new digit is placed on top of the earlier
+    propagation and propagated from there. Clearing a cell can make
+    earlier deductions wrong, so the propagation is redone, once, on the
+    next query that needs it.
+
+    whether the grid is known to have no solution, which also holds
+    after setting a cell
+
+so most edits cost a few mask updates and at most one propagation, and
+a search only runs while the last solution is broken.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+from . import xumpy as xp
+from . import sudokusolver as solver
+from . import propagation
+from .constraints import ConstraintState, BITS
+from .geometry import box_size_of
+from .tracing import SolveStats
+
+
+class SolveSession(object):
+    """
+    Grid under interactive editing. matrix is copied, and may have any
+    number of unfilled cells, including none. Cells are (row, col)
+    tuples counted from 0. counts holds the number of solve() calls
+    answered from the last solution, from the known lack of one, and by
+    searching.
+    """
+
+    def __init__(self, matrix):
+        size = len(matrix)
+        assert box_size_of(size) is not None, 'Grid does not have 4, 9, 16 or 25 rows'
+        for row in matrix:
+            assert len(row) == size, 'Grid does not have {} cols'.format(size)
+        self.matrix = [[0] * size for _ in range(size)]
+        self.state = ConstraintState(self.matrix)
+        self.geometry = self.state.geometry
+        # number of cells holding each digit, per unit
+        self.unit_counts = [[0] * (size + 1) for _ in range(3 * size)]
+        # digits placed more than once in a unit
+        self.repeats = 0
+        self.solution = None
+        # filled cells whose digit differs from the last solution
+        self.mismatches = 0
+        self.unsolvable = False
+        self.deduced = None
+        self.counts = {'reused': 0, 'known unsolvable': 0, 'searched': 0}
+        for (i, j) in self.geometry.coords:
+            if matrix[i][j] != 0:
+                self.set_cell((i, j), matrix[i][j])
+
+    def set_cell(self, cell, value):
+        """
+        Fills cell with value, replacing its digit if it has one. A value
+        of 0 clears the cell.
+        """
+        (i, j) = cell
+        assert 0 <= value <= self.geometry.size, 'Value outside 0 to {}'.format(self.geometry.size)
+        if self.matrix[i][j] == value:
+            return
+        if self.matrix[i][j] != 0:
+            self.clear_cell(cell)
+        if value == 0:
+            return
+        self.matrix[i][j] = value
+        self._count(i, j, value, 1)
+        if self.solution is not None and self.solution[i][j] != value:
+            self.mismatches += 1
+        if self.deduced is not None:
+            self._deduce(i, j, value)
+
+    def clear_cell(self, cell):
+        """
+        Empties cell
+        """
+        (i, j) = cell
+        value = self.matrix[i][j]
+        if value == 0:
+            return
+        self.matrix[i][j] = 0
+        self._count(i, j, value, -1)
+        if self.solution is not None and self.solution[i][j] != value:
+            self.mismatches -= 1
+        self.unsolvable = False
+        self.deduced = None
+
+    def candidates(self, cell):
+        """
+        Returns the mask of digits that can be placed in cell without
+        repeating a digit in its row, column or region, as in
+        ConstraintState.candidates, or 0 for a filled cell
+        """
+        (i, j) = cell
+        if self.matrix[i][j] != 0:
+            return 0
+        return self.state.candidates(i, j)
+
+    def is_consistent(self):
+        """
+        Checks if no digit is repeated in a row, column or region and the
+        grid can still be completed
+        """
+        return self.solve() is not None
+
+    def solve(self):
+        """
+        Returns a solution of the grid as a new matrix, or None if the grid
+        has none
+        """
+        if self.solution is not None and self.mismatches == 0:
+            self.counts['reused'] += 1
+            return xp.copy(self.solution)
+        if self.repeats or self.unsolvable:
+            self.counts['known unsolvable'] += 1
+            return None
+        self.counts['searched'] += 1
+        if self.deduced is None:
+            self._propagate()
+        if self.deduced is None:
+            return None
+        (matrix, state, trail) = self.deduced
+        zero_indices = xp.where(matrix, 0)
+        mark = len(trail)
+        solution = solver._solve_propagate(matrix, zero_indices, range(len(zero_indices[0])), -1, 0,
+                                           SolveStats('counters'), state, trail)
+        if solution is None:
+            self.unsolvable = True
+            return None
+        self.solution = xp.copy(solution)
+        self.mismatches = 0
+        # leave the propagated grid as it was for the next edits
+        propagation.undo(matrix, state, trail, mark)
+        return xp.copy(self.solution)
+
+    def _count(self, i, j, value, step):
+        """
+        Adds step cells with value to the units of cell[i][j], updating the
+        masks when a digit enters or leaves a unit
+        """
+        size = self.geometry.size
+        bit = BITS[value]
+        box = self.state.box_at[i][j]
+        for (unit, masks, k) in ((i, self.state.rows, i), (size + j, self.state.cols, j),
+                                 (2 * size + box, self.state.boxes, box)):
+            count = self.unit_counts[unit][value] + step
+            self.unit_counts[unit][value] = count
+            if step > 0:
+                if count == 1:
+                    masks[k] |= bit
+                else:
+                    self.repeats += 1
+            else:
+                if count == 0:
+                    masks[k] &= ~bit
+                else:
+                    self.repeats -= 1
+
+    def _propagate(self):
+        """
+        Propagates singles from the current grid into self.deduced, a
+        (matrix, state, trail) triple, or marks the grid unsolvable
+        """
+        if self.repeats:
+            return
+        matrix = xp.copy(self.matrix)
+        state = ConstraintState(matrix)
+        trail = []
+        if propagation.propagate(matrix, state, trail) is None:
+            self.unsolvable = True
+            return
+        self.deduced = (matrix, state, trail)
+
+    def _deduce(self, i, j, value):
+        """
+        Places a new digit on top of the propagated grid
+        """
+        (matrix, state, trail) = self.deduced
+        if matrix[i][j] == value:
+            # already deduced
+            return
+        if self.repeats:
+            self.deduced = None
+            return
+        if matrix[i][j] != 0 or not state.allows(i, j, value):
+            # every solution has the deduced digits, so none has this one
+            self.unsolvable = True
+            self.deduced = None
+            return
+        propagation.place(matrix, state, trail, i, j, value)
+        if propagation.propagate(matrix, state, trail) is None:
+            self.unsolvable = True
+            self.deduced = None
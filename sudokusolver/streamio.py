@@ -0,0 +1,91 @@
+"""
+This module contains the streaming input and output used to solve
+puzzle files of any size. Puzzles are read lazily, one at a time,
+from a file or stdin, and results are written through a buffered
+writer, so memory use does not grow with the size of the input.
+A path of '-' means stdin for input and stdout for output.
+
+Two input formats are supported: one puzzle per line as 81 characters
+with 0 or . for unfilled cells, and blocks of 9 comma separated lines
+as in data/*.csv.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+import sys
+
+# size of the write buffer in bytes
+BUFFER_SIZE = 1 << 16
+
+
+def open_input(path):
+    """
+    Opens path for reading, or returns stdin if path is '-'
+    """
+    if path == '-':
+        return sys.stdin
+    return open(path, 'r')
+
+
+def open_output(path):
+    """
+    Opens path for buffered writing, or returns stdout if path is '-'
+    """
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', BUFFER_SIZE)
+
+
+def close(stream):
+    """
+    Closes a stream opened by open_input or open_output, leaving
+    stdin and stdout open
+    """
+    if stream is not sys.stdin and stream is not sys.stdout:
+        stream.close()
+
+
+def read_puzzle_lines(stream):
+    """
+    Yields the non-blank lines of the stream, stripped of whitespace
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def read_csv_matrices(stream):
+    """
+    Yields square matrices from a stream of comma separated rows. A
+    matrix of n columns takes the next n non-blank lines, so 9x9 and
+    larger grids can follow each other.
+    """
+    matrix = []
+    for line in read_puzzle_lines(stream):
+        matrix.append([int(item) for item in line.split(',')])
+        assert len(matrix[-1]) == len(matrix[0]), 'Input has rows of {} and {} values in one matrix'.format(
+            len(matrix[0]), len(matrix[-1]))
+        if len(matrix) == len(matrix[0]):
+            yield matrix
+            matrix = []
+    assert len(matrix) == 0, 'Input ends with an incomplete matrix of {} rows'.format(len(matrix))
+
+
+def write_lines(stream, lines, flush_every=1024):
+    """
+    Writes each line from the iterable to the stream, handing them to the
+    stream in groups of flush_every lines. Returns the number of lines.
+    """
+    count = 0
+    pending = []
+    for line in lines:
+        pending.append(line)
+        if len(pending) >= flush_every:
+            stream.write(''.join(pending))
+            count += len(pending)
+            pending = []
+    if pending:
+        stream.write(''.join(pending))
+        count += len(pending)
+    stream.flush()
+    return count
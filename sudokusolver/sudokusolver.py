@@ -2,23 +2,27 @@
 This module contains the core functions to solve Sudoku puzzle.
 The module has a soft dependency on sudokusolver.plotutilities,
 which is used to graphically render the Sudoku solution. This
-module will still run without plotutilities. This module depends
-on numpy library.
+module will still run without plotutilities. plotutilities, and with
+it matplotlib, is only imported when a solution is rendered, so
+solving without a plot stays quick to start.
 """
 __author__ = 'krishnakumarramamoorthy'
 
 import time
 import sys
 import os
-from math import ceil
 
-try:
-    import plotutilities as plotter
-    is_matplotlib_available = True
-except ImportError:
-    is_matplotlib_available = False
-    print 'Plotting module could not be imported. Only textual output will be provided'
-import xumpy as xp
+from . import xumpy as xp
+from .constraints import ConstraintState, BITS, popcount
+from .geometry import box_size_of, geometry_of
+from .tracing import SolveStats, LEVELS, as_stats
+from .instrumentation import Instrumentation, NO_INSTRUMENTATION
+from .budget import Budget, BudgetExhausted
+from . import propagation
+from . import dlx
+
+DIGITS = (1, 2, 3, 4, 5, 6, 7, 8, 9)
+STRATEGIES = ('backtrack', 'iterative', 'mrv', 'propagate', 'dlx')
 
 
 def main():
@@ -28,125 +32,573 @@ def main():
     console window. Write the solution to
     <input_file_name>-out.csv file. If Matplotlib is available,
     then displays the solution graphically and saves a screenshot
-    to <input_file_name>-out.png
+    to <input_file_name>-out.png. A puzzle without a solution is
+    reported without writing or plotting anything.
 
     Optional argument: </path/to/csv/problem/file>
         Default: '/data/input.csv'
         The input file is expected to be contain 9 lines,
         with each line containing 9 values separated by comma.
-        Unfilled cells will be identified by 0 (zero).
+        Unfilled cells will be identified by 0 (zero). Grids of
+        4, 16 or 25 lines (digits up to 4, 16 or 25) are also
+        accepted.
+    Optional argument: --strategy <backtrack|iterative|mrv|propagate|dlx>
+        Default: 'backtrack'
+        backtrack and iterative fill the cells row by row, mrv fills
+        the cell with the fewest candidates first and propagate also
+        fills every cell that can be deduced without guessing. dlx
+        solves the puzzle as an exact cover problem with Dancing Links.
+    Optional argument: --stats <off|counters|sampled|trace>
+        Default: 'trace'
+        How much of the search is recorded for the statistics and the
+        plot. With --trace-size <n> only the latest n recorded nodes are
+        kept, and with 'sampled' one node in --sample-every <n>.
+    Optional argument: --count [<limit>]
+        Only count the solutions, up to limit (default 2), and report
+        whether the puzzle has exactly one solution.
+    Optional argument: --timings [</path/to/timings.jsonl>]
+        Times each phase (load, validate, propagate, search, write and
+        render) and appends one JSON line per phase to the file, or
+        writes them to stderr if no file is given.
+    Optional argument: --profile <dir>
+        Saves a cProfile profile of each phase to <dir>/<phase>.prof
+    Optional argument: --trace-memory
+        Adds the memory allocated by each phase to the timings; only
+        used with --timings
+    Optional argument: --headless
+        Only saves the screenshot, without a display and without
+        waiting for the plot window to be closed
+    Optional argument: --no-plot
+        Only gives the textual output; matplotlib is not imported
+    Optional argument: --deadline <secs>, --max-nodes <n>
+        Stops the search after secs seconds or n nodes and reports how
+        far it got, instead of writing a solution
     """
-    path = PROJECT_ROOT + '/data/input.csv'
+    args = parse_arguments(sys.argv[1:])
+    instrumentation = create_instrumentation(args)
     try:
-        if len(sys.argv) > 1:
-            path = sys.argv[1]
-    except:
-        print 'Using default input file in ' + path
-    [input_matrix, zero_indices] = load_input(path)
-    # init
-    current_zero_index = -1
-    stats = {'index': [], 'values': []}
+        return solve_file(args, instrumentation)
+    finally:
+        close_instrumentation(instrumentation)
+
+
+def solve_file(args, instrumentation):
+    """
+    Solves, writes and plots the puzzle of the command line arguments, as
+    described for main
+    """
+    path = args.path
+    [input_matrix, zero_indices] = load_input(path, instrumentation)
+    if args.count is not None:
+        count = count_solutions(input_matrix, args.count)
+        print_count(count, args.count)
+        return count
+    stats = SolveStats(args.stats, args.sample_every, args.trace_size)
     ts = time.time()
-    # pass a deep copy of input_matrix to solver
-    [solved_matrix, stats] = solve(xp.copy(input_matrix), zero_indices, current_zero_index, stats)
+    budget = None
+    if args.deadline is not None or args.max_nodes is not None:
+        budget = Budget(args.deadline, args.max_nodes)
+    result = solve_with_budget(input_matrix, zero_indices, args.strategy, budget, stats, instrumentation)
+    if result['status'] == 'exhausted':
+        print_exhausted(result)
+        return result
+    if result['status'] == 'unsolvable':
+        print_unsolvable(result)
+        return result
+    solved_matrix = result['solution']
     time_to_solution = time.time() - ts
     out_path = path.replace('.csv', '_out.csv')
-    write_solution(solved_matrix, out_path)
-    print_solution(solved_matrix, time_to_solution, len(stats['index']))
-    if is_matplotlib_available:
-        fig_out_path = path.replace('.csv', '_out')
-        plotter.visualize_solution(input_matrix, solved_matrix, stats, zero_indices, ts, fig_out_path, time_to_solution)
-    else:
-        print 'Matplotlib import not successful. Cannot graphically display solution.'
+    with instrumentation.phase('write'):
+        write_solution(solved_matrix, out_path)
+    print_solution(solved_matrix, time_to_solution, stats, stats.get('propagated'))
+    if not args.no_plot:
+        plotter = import_plotter()
+        if plotter is not None:
+            fig_out_path = path.replace('.csv', '_out')
+            with instrumentation.phase('render'):
+                plotter.visualize_solution(input_matrix, solved_matrix, stats, zero_indices, ts, fig_out_path,
+                                           time_to_solution, args.headless)
+        else:
+            print('Plotting module could not be imported. Only textual output will be provided', file=sys.stderr)
+            print('Matplotlib import not successful. Cannot graphically display solution.')
     return solved_matrix, stats
 
 
-def solve(matrix, zero_indices, current_zero_index, stats):
+def close_instrumentation(instrumentation):
+    """
+    Saves the profiles of instrumentation and closes its timings file
+    """
+    if instrumentation is not NO_INSTRUMENTATION:
+        instrumentation.save_profiles()
+        if instrumentation.stream is not None and instrumentation.stream is not sys.stderr:
+            instrumentation.stream.close()
+
+
+def import_plotter():
+    """
+    Imports plotutilities, which loads matplotlib, when a solution is
+    first rendered. Returns None if it cannot be imported.
+    """
+    try:
+        from . import plotutilities
+    except ImportError:
+        return None
+    return plotutilities
+
+
+def create_instrumentation(args):
+    """
+    Returns the Instrumentation asked for by the command line arguments,
+    or NO_INSTRUMENTATION
+    """
+    if args.timings is None and args.profile is None:
+        return NO_INSTRUMENTATION
+    # the timings are only written when asked for, not for profiling alone
+    if args.timings is None:
+        stream = None
+    elif args.timings == '-':
+        stream = sys.stderr
+    else:
+        stream = open(args.timings, 'a')
+    trace_memory = stream is not None and args.trace_memory
+    return Instrumentation(stream=stream, profile_dir=args.profile, trace_memory=trace_memory,
+                           context={'puzzle': args.path, 'strategy': args.strategy})
+
+
+def parse_arguments(argv):
+    """
+    Parses the command line arguments of main
+    """
+    # argparse is slow to import, so solving through the API does without it
+    import argparse
+    parser = argparse.ArgumentParser(description='Solve a Sudoku puzzle.')
+    parser.add_argument('path', nargs='?', default=PROJECT_ROOT + '/data/input.csv',
+                        help='path to the csv problem file')
+    parser.add_argument('--strategy', default='backtrack', choices=STRATEGIES,
+                        help='search strategy used to solve the puzzle')
+    parser.add_argument('--stats', default='trace', choices=LEVELS,
+                        help='how much of the search is recorded')
+    parser.add_argument('--sample-every', type=int, default=1000, metavar='N',
+                        help='with --stats sampled, record one node in N')
+    parser.add_argument('--trace-size', type=int, default=None, metavar='N',
+                        help='only keep the latest N recorded nodes')
+    parser.add_argument('--timings', nargs='?', const='-', metavar='PATH',
+                        help='write the time of each phase as JSON lines (default: stderr)')
+    parser.add_argument('--profile', metavar='DIR', help='save a cProfile profile of each phase to DIR')
+    parser.add_argument('--trace-memory', action='store_true', help='add the memory allocated by each phase')
+    parser.add_argument('--count', type=int, nargs='?', const=2, metavar='LIMIT',
+                        help='only count the solutions, up to LIMIT (default 2)')
+    parser.add_argument('--headless', action='store_true', help='save the plot without showing it')
+    parser.add_argument('--no-plot', action='store_true', help='only print and write the solution')
+    parser.add_argument('--deadline', type=float, metavar='SECS', help='stop the search after SECS seconds')
+    parser.add_argument('--max-nodes', type=int, metavar='N', help='stop the search after N nodes')
+    return parser.parse_args(argv)
+
+
+def solve_puzzle(input_matrix, zero_indices, strategy='backtrack', stats=None, instrumentation=NO_INSTRUMENTATION):
     """
-    Implementation of recursive backtracking algorithm to solve the sudoku matrix
+    Solves a copy of input_matrix with one of the STRATEGIES and
+    returns [solved_matrix, stats]. solved_matrix is None if the
+    puzzle has no solution, which includes puzzles with a digit repeated
+    in a row, column or region. stats is a tracing.SolveStats, by default
+    one that keeps the full trace. The search, and the propagation done
+    before it, are timed as phases of instrumentation.
     """
+    if strategy not in STRATEGIES:
+        raise ValueError('Unknown strategy: {}'.format(strategy))
+    # pass a deep copy of input_matrix to solver
+    matrix = xp.copy(input_matrix)
+    stats = SolveStats() if stats is None else as_stats(stats)
+    state = ConstraintState(matrix)
+    if state.conflicts:
+        return [None, stats]
+    if strategy == 'propagate':
+        return solve_propagate(matrix, zero_indices, stats, state, instrumentation)
+    with instrumentation.phase('search', stats):
+        if strategy == 'backtrack':
+            return solve(matrix, zero_indices, -1, stats, state)
+        elif strategy == 'iterative':
+            return solve_iterative(matrix, zero_indices, stats, state)
+        elif strategy == 'mrv':
+            return solve_mrv(matrix, zero_indices, stats, state)
+        return dlx.solve_dlx(matrix, zero_indices, stats)
+
+
+def solve_with_budget(input_matrix, zero_indices, strategy='propagate', budget=None, stats=None,
+                      instrumentation=NO_INSTRUMENTATION):
+    """
+    Solves like solve_puzzle, within a budget.Budget: a deadline, a node
+    budget, a cancellation token and a progress callback. Returns a dict
+    with the status ('solved', 'unsolvable' or 'exhausted'), the solution
+    (None unless solved), the reason the budget ran out (one of
+    budget.REASONS, or None), the nodes explored, the seconds taken and
+    the stats, by default counters only. Without a budget the search runs
+    unlimited and the nodes are those counted by stats.
+    """
+    stats = SolveStats('counters') if stats is None else as_stats(stats)
+    ts = time.time()
+    if budget is None:
+        solved_matrix = solve_puzzle(input_matrix, zero_indices, strategy, stats, instrumentation)[0]
+        return {'status': 'solved' if solved_matrix is not None else 'unsolvable', 'solution': solved_matrix,
+                'reason': None, 'nodes': stats.nodes, 'secs': time.time() - ts, 'stats': stats}
+    try:
+        budget.attach(stats)
+        solved_matrix = solve_puzzle(input_matrix, zero_indices, strategy, stats, instrumentation)[0]
+    except BudgetExhausted as e:
+        return {'status': 'exhausted', 'solution': None, 'reason': e.reason, 'nodes': e.nodes,
+                'secs': time.time() - ts, 'stats': stats}
+    finally:
+        budget.detach(stats)
+    return {'status': 'solved' if solved_matrix is not None else 'unsolvable', 'solution': solved_matrix,
+            'reason': None, 'nodes': budget.nodes, 'secs': time.time() - ts, 'stats': stats}
+
+
+def solve(matrix, zero_indices, current_zero_index, stats, state=None):
+    """
+    Implementation of recursive backtracking algorithm to solve the sudoku matrix.
+    Candidates are checked against the used-digit masks in state, which is
+    built from matrix on the first call and updated as cells are filled.
+    """
+    stats = as_stats(stats)
+    if state is None:
+        state = ConstraintState(matrix)
     current_zero_index += 1
     if current_zero_index >= len(zero_indices[0]):
         return [matrix, stats]
     row = zero_indices[0][current_zero_index]
     col = zero_indices[1][current_zero_index]
     prev_zero_index_value = matrix[zero_indices[0][current_zero_index - 1]][zero_indices[1][current_zero_index - 1]]
-    number = 0
-    for number in range(1, 10):
-        # store tuples for creating links
-        stats['index'].append((current_zero_index - 1, current_zero_index))
-        stats['values'].append((prev_zero_index_value, number))
+    for number in state.geometry.digits:
+        # record the node for creating links
+        stats.record(current_zero_index - 1, current_zero_index, prev_zero_index_value, number,
+                     current_zero_index + 1)
         # check if the solution satisfies all - column, row and region - rules
-        is_acceptable = evaluate_solution(matrix, row, col, number)
-        if is_acceptable:
+        if state.allows(row, col, number):
             matrix[row][col] = number
-            [solution, stats] = solve(matrix, zero_indices, current_zero_index, stats)
+            state.place(row, col, number)
+            [solution, stats] = solve(matrix, zero_indices, current_zero_index, stats, state)
             if solution is not None:
                 return [solution, stats]
-    if number is 9:
+            state.remove(row, col, number)
+            matrix[row][col] = 0
+    return [None, stats]
+
+
+def solve_iterative(matrix, zero_indices, stats, state=None):
+    """
+    Iterative version of solve. Instead of recursing once per unfilled cell,
+    it keeps an explicit stack, preallocated with one entry per unfilled cell,
+    holding the next candidate to try for that cell. The cells are filled in
+    the order of zero_indices, so the stack depth is also the position of the
+    cell. Returns the same solution and stats trace as solve.
+    """
+    stats = as_stats(stats)
+    if state is None:
+        state = ConstraintState(matrix)
+    rows = zero_indices[0]
+    cols = zero_indices[1]
+    box_at = state.box_at
+    boxes = [box_at[rows[p]][cols[p]] for p in range(len(rows))]
+    row_masks = state.rows
+    col_masks = state.cols
+    box_masks = state.boxes
+    record = stats.record
+    size = state.geometry.size
+    n = len(rows)
+    next_number = [1] * n
+    depth = 0
+    while 0 <= depth < n:
+        row = rows[depth]
+        col = cols[depth]
+        number = next_number[depth]
+        if number > size:
+            # all candidates tried; undo the cell below and resume from its next candidate
+            next_number[depth] = 1
+            depth -= 1
+            if depth >= 0:
+                state.remove(rows[depth], cols[depth], matrix[rows[depth]][cols[depth]])
+                matrix[rows[depth]][cols[depth]] = 0
+            continue
+        next_number[depth] = number + 1
+        record(depth - 1, depth, matrix[rows[depth - 1]][cols[depth - 1]], number, depth + 1)
+        bit = BITS[number]
+        if not (row_masks[row] | col_masks[col] | box_masks[boxes[depth]]) & bit:
+            matrix[row][col] = number
+            row_masks[row] |= bit
+            col_masks[col] |= bit
+            box_masks[boxes[depth]] |= bit
+            depth += 1
+    if depth < 0:
         return [None, stats]
+    return [matrix, stats]
+
+
+def solve_mrv(matrix, zero_indices, stats, state=None):
+    """
+    Backtracking search that always fills the unfilled cell with the fewest
+    candidates (minimum remaining values). Ties go to the cell with the most
+    unfilled peers (degree). The stats trace uses the positions in
+    zero_indices, so it can be plotted the same way as the one from solve.
+    """
+    stats = as_stats(stats)
+    if state is None:
+        state = ConstraintState(matrix)
+    open_positions = [p for p in range(len(zero_indices[0]))
+                      if matrix[zero_indices[0][p]][zero_indices[1][p]] == 0]
+    solution = _solve_mrv(matrix, zero_indices, open_positions, -1, 1, stats, state)
+    return [solution, stats]
+
+
+def _solve_mrv(matrix, zero_indices, open_positions, prev_position, depth, stats, state):
+    if not open_positions:
+        return matrix
+    k = select_mrv_position(zero_indices, open_positions, state)
+    if k is None:
+        return None
+    position = open_positions[k]
+    row = zero_indices[0][position]
+    col = zero_indices[1][position]
+    prev_value = matrix[zero_indices[0][prev_position]][zero_indices[1][prev_position]]
+    mask = state.candidates(row, col)
+    # swap the chosen cell to the end so that it can be popped and restored in place
+    open_positions[k] = open_positions[-1]
+    open_positions[-1] = position
+    open_positions.pop()
+    for number in state.geometry.digits:
+        if mask & BITS[number]:
+            stats.record(prev_position, position, prev_value, number, depth)
+            matrix[row][col] = number
+            state.place(row, col, number)
+            if _solve_mrv(matrix, zero_indices, open_positions, position, depth + 1, stats, state) is not None:
+                return matrix
+            state.remove(row, col, number)
+            matrix[row][col] = 0
+    open_positions.append(position)
+    open_positions[k], open_positions[-1] = open_positions[-1], open_positions[k]
+    return None
+
+
+def solve_propagate(matrix, zero_indices, stats, state=None, instrumentation=NO_INSTRUMENTATION):
+    """
+    Backtracking search with constraint propagation. Naked and hidden singles
+    are filled before the search starts and again after every guess, so dead
+    ends are detected early. Guesses are made on the cell with the fewest
+    candidates. stats['propagated'] holds the number of cells of the solution
+    that were deduced rather than guessed. The first propagation and the
+    search are timed as the propagate and search phases of instrumentation.
+    """
+    stats = as_stats(stats)
+    if state is None:
+        state = ConstraintState(matrix)
+    stats['propagated'] = 0
+    trail = []
+    with instrumentation.phase('propagate', stats):
+        consistent = propagation.propagate(matrix, state, trail) is not None
+    if not consistent:
+        return [None, stats]
+    positions = range(len(zero_indices[0]))
+    with instrumentation.phase('search', stats):
+        solution = _solve_propagate(matrix, zero_indices, positions, -1, 0, stats, state, trail)
+    return [solution, stats]
+
+
+def _solve_propagate(matrix, zero_indices, positions, prev_position, guesses, stats, state, trail):
+    open_positions = [p for p in positions if matrix[zero_indices[0][p]][zero_indices[1][p]] == 0]
+    if not open_positions:
+        stats['propagated'] = len(positions) - guesses
+        return matrix
+    k = select_mrv_position(zero_indices, open_positions, state)
+    if k is None:
+        return None
+    position = open_positions[k]
+    row = zero_indices[0][position]
+    col = zero_indices[1][position]
+    prev_value = matrix[zero_indices[0][prev_position]][zero_indices[1][prev_position]]
+    mask = state.candidates(row, col)
+    for number in state.geometry.digits:
+        if mask & BITS[number]:
+            stats.record(prev_position, position, prev_value, number, guesses + 1)
+            mark = len(trail)
+            propagation.place(matrix, state, trail, row, col, number)
+            if propagation.propagate(matrix, state, trail) is not None:
+                if _solve_propagate(matrix, zero_indices, positions, position, guesses + 1,
+                                    stats, state, trail) is not None:
+                    return matrix
+            propagation.undo(matrix, state, trail, mark)
+    return None
+
+
+def count_solutions(matrix, limit=2):
+    """
+    Counts the solutions of the sudoku matrix, stopping as soon as limit
+    solutions are found. The search propagates naked and hidden singles
+    after every guess and guesses on the cell with the fewest candidates,
+    so dead ends are cut early. A count of 1 means the puzzle is proper.
+    The matrix is not modified.
+    """
+    matrix = xp.copy(matrix)
+    state = ConstraintState(matrix)
+    trail = []
+    if state.conflicts or propagation.propagate(matrix, state, trail) is None:
+        return 0
+    return _count_solutions(matrix, state, trail, limit)
+
+
+def _count_solutions(matrix, state, trail, limit):
+    best = None
+    best_count = state.geometry.size + 1
+    for (i, j) in state.geometry.coords:
+        if matrix[i][j] == 0:
+            count = popcount(state.candidates(i, j))
+            if count < best_count:
+                best = (i, j)
+                best_count = count
+                if count == 2:
+                    break
+    if best is None:
+        return 1
+    (row, col) = best
+    mask = state.candidates(row, col)
+    found = 0
+    for number in state.geometry.digits:
+        if mask & BITS[number]:
+            mark = len(trail)
+            propagation.place(matrix, state, trail, row, col, number)
+            if propagation.propagate(matrix, state, trail) is not None:
+                found += _count_solutions(matrix, state, trail, limit - found)
+            propagation.undo(matrix, state, trail, mark)
+            if found >= limit:
+                break
+    return found
+
+
+def select_mrv_position(zero_indices, open_positions, state):
+    """
+    Returns the index in open_positions of the cell with the fewest
+    candidates, breaking ties by degree. Returns None if some cell
+    has no candidates left.
+    """
+    rows = zero_indices[0]
+    cols = zero_indices[1]
+    size = state.geometry.size
+    peer_sets = state.geometry.peer_sets
+    best = None
+    best_count = size + 1
+    best_degree = -1
+    for k in range(len(open_positions)):
+        i = rows[open_positions[k]]
+        j = cols[open_positions[k]]
+        count = popcount(state.candidates(i, j))
+        if count == 0:
+            return None
+        if count > best_count:
+            continue
+        peers = peer_sets[i * size + j]
+        degree = 0
+        for q in open_positions:
+            if rows[q] * size + cols[q] in peers:
+                degree += 1
+        if count < best_count or degree > best_degree:
+            best = k
+            best_count = count
+            best_degree = degree
+    return best
 
 
 def evaluate_solution(matrix, i, j, n):
     """
     Checks if the value for cell[i][j] is a valid solution
     """
+    assert box_size_of(len(matrix)) is not None, 'Matrix does not have 4, 9, 16 or 25 rows'
     matrix[i][j] = 0
-    row_length = 1
-    region_repeat = 1
-    valid = False
-    col_length = len((xp.where(matrix[i], n))[0])
-    if col_length is 0:
-        row_length = len((xp.where(xp.get_sub_matrix(matrix, 0, 9, j, j + 1), n))[0])
-    if row_length is 0:
-        i_region = int(ceil((i + 1) / 3.0) - 1)
-        j_region = int(ceil((j + 1) / 3.0) - 1)
-        region_matrix = xp.get_sub_matrix(matrix, i_region * 3, i_region * 3 + 3, j_region * 3, j_region * 3 + 3)
-        region_repeat = (len((xp.where(region_matrix, n))[0]) + len((xp.where(region_matrix, n))[1]))
-    if region_repeat is 0:
-        valid = True
-    return valid
-
-
-def print_solution(solved_matrix, time_to_solution, iterations):
-    print '============= Stats ============='
-    print 'Time to solution: {:.4f} secs'.format(time_to_solution)
-    print 'Total iterations: {}'.format(iterations)
-    print '=========== Solution ============'
+    geometry = geometry_of(matrix)
+    for p in geometry.peers[i * geometry.size + j]:
+        (a, b) = geometry.coords[p]
+        if matrix[a][b] == n:
+            return False
+    return True
+
+
+def print_solution(solved_matrix, time_to_solution, stats, propagated=None):
+    print('============= Stats =============')
+    print('Time to solution: {:.4f} secs'.format(time_to_solution))
+    if stats.level != 'off':
+        print('Total iterations: {}'.format(stats.nodes))
+        print('Backtracks:       {}'.format(stats.backtracks))
+        print('Max depth:        {}'.format(stats.max_depth))
+    if propagated is not None:
+        print('Cells propagated: {}'.format(propagated))
+    print('=========== Solution ============')
     for row in solved_matrix:
-        print row
-    print '================================='
+        print(row)
+    print('=================================')
     validate_solution(solved_matrix)
 
 
-def load_input(path):
+def print_exhausted(result):
+    print('============= Stats =============')
+    print('Time spent:       {:.4f} secs'.format(result['secs']))
+    print('Budget exhausted: {} after {} nodes'.format(result['reason'], result['nodes']))
+    print('=================================')
+
+
+def print_unsolvable(result):
+    print('============= Stats =============')
+    print('Time spent:       {:.4f} secs'.format(result['secs']))
+    print('No solution found after {} nodes'.format(result['nodes']))
+    print('=================================')
+
+
+def print_count(count, limit):
+    print('============= Count =============')
+    if count >= limit:
+        print('Solutions: at least {}'.format(count))
+    else:
+        print('Solutions: {}'.format(count))
+    if count == 1:
+        print('Puzzle is proper: it has exactly one solution')
+    else:
+        print('Puzzle is not proper: it should have exactly one solution')
+    print('=================================')
+
+
+def load_input(path, instrumentation=NO_INSTRUMENTATION):
     """
     Loads problem file and checks if it is a valid sudoku matrix
     """
-    input_matrix = xp.loadtxt(path, dtype=int, delimiter=',')
-    validate_input(input_matrix)
-    # find all the unfilled cells, currently set to 0
-    zero_indices = xp.where(input_matrix, 0)
+    with instrumentation.phase('load'):
+        input_matrix = xp.loadtxt(path, dtype=int, delimiter=',')
+    with instrumentation.phase('validate'):
+        validate_input(input_matrix)
+        # find all the unfilled cells, currently set to 0
+        zero_indices = xp.where(input_matrix, 0)
     return input_matrix, zero_indices
 
 
 def validate_input(input_matrix):
-    assert len(input_matrix) == 9, 'Input matrix does not have 9 rows'
-    assert len(input_matrix[0]) == 9, 'Input matrix does not have 9 cols'
+    size = len(input_matrix)
+    assert box_size_of(size) is not None, 'Input matrix does not have 4, 9, 16 or 25 rows'
+    for row in input_matrix:
+        assert len(row) == size, 'Input matrix does not have {} cols'.format(size)
+        for val in row:
+            assert 0 <= val <= size, 'Input matrix has a value outside 0 to {}'.format(size)
     assert len((xp.where(input_matrix, 0))[0]) > 0, 'Input matrix does not have any unfilled cells'
 
 
 def validate_solution(solved_matrix):
-    for i in range(9):
-        assert len(set(solved_matrix[i])) == 9, 'Solution invalid: Row {} is not unique'.format(i + 1)
-        assert len(set(sum(xp.get_sub_matrix(solved_matrix, 0, 9, i, i + 1),
-                    []))) == 9, 'Solution invalid: Col {} is not unique'.format(i + 1)
-        j = divmod(i + 1, 3)[1]
-        i_region = int(ceil((i + 1) / 3.0) - 1)
-        j_region = int(ceil((j + 1) / 3.0) - 1)
-        assert (len(set(sum(xp.get_sub_matrix(solved_matrix, i_region * 3, i_region * 3 + 3,
-                                              j_region * 3, j_region * 3 + 3), []))) == 9), \
-            ('Solution invalid: Region {},{} is not unique'.format(i + 1, j + 1))
+    assert box_size_of(len(solved_matrix)) is not None, 'Solution invalid: Does not have 4, 9, 16 or 25 rows'
+    geometry = geometry_of(solved_matrix)
+    size = geometry.size
+    for u in range(len(geometry.unit_coords)):
+        values = set(solved_matrix[i][j] for (i, j) in geometry.unit_coords[u])
+        if u < size:
+            assert values == geometry.digit_set, 'Solution invalid: Row {} is not unique'.format(u + 1)
+        elif u < 2 * size:
+            assert values == geometry.digit_set, 'Solution invalid: Col {} is not unique'.format(u - size + 1)
+        else:
+            (i_region, j_region) = divmod(u - 2 * size, geometry.box_size)
+            assert values == geometry.digit_set, \
+                'Solution invalid: Region {},{} is not unique'.format(i_region + 1, j_region + 1)
 
 
 def write_solution(solved_matrix, out_path):
@@ -0,0 +1,197 @@
+"""
+This module contains the statistics collector of the Sudoku solvers.
+Every candidate a solver tries is a node of the search, and each node
+is handed to SolveStats.record. How much is kept depends on the level:
+
+    off       nothing is recorded
+    counters  node count, backtracks, maximum depth and the number of
+              evaluations of each unfilled cell
+    sampled   the counters, plus every sample_every-th node
+    trace     the counters, plus every node
+
+Kept nodes are stored in compact arrays. If a capacity is given, the
+arrays are a fixed-size ring buffer that keeps only the latest nodes,
+so memory use does not grow with the length of the search.
+
+Callers may still pass the plain {'index': [], 'values': []} dict the
+solvers used to fill; as_stats wraps it so that every node is appended
+to the dict as before.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+from array import array
+
+# collection levels, from the cheapest to the most detailed
+LEVELS = ('off', 'counters', 'sampled', 'trace')
+
+
+class SolveStats(object):
+    """
+    Statistics of one solve. nodes, backtracks and max_depth are the
+    summary counters and histogram maps the position of a cell in
+    zero_indices to the number of times it was evaluated. A backtrack is
+    counted when a node is shallower than the node before it, i.e. the
+    search has given up on a cell; trying the next candidate of the same
+    cell is not one.
+
+    For backwards compatibility, stats['index'] and stats['values'] return
+    the kept nodes as (prev_position, position) and (prev_value, value)
+    tuples, and any other key (e.g. stats['propagated']) is stored in extras.
+    """
+
+    def __init__(self, level='trace', sample_every=1000, capacity=None):
+        assert level in LEVELS, 'Unknown stats level: {}'.format(level)
+        assert capacity is None or capacity > 0, 'Trace capacity should be positive'
+        self.level = level
+        self.sample_every = sample_every
+        self.capacity = capacity
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.last_depth = 0
+        self.histogram = {}
+        self.extras = {}
+        # number of nodes ever kept; with a capacity only the latest ones are stored
+        self.kept = 0
+        size = capacity or 0
+        self.node_numbers = array('l', [0] * size)
+        self.prev_positions = array('l', [0] * size)
+        self.positions = array('l', [0] * size)
+        self.prev_values = array('l', [0] * size)
+        self.values = array('l', [0] * size)
+        # the record method is chosen once, so the solvers pay only for the chosen level
+        if level == 'off':
+            self.record = self._record_off
+        elif level == 'counters':
+            self.record = self._count
+        elif level == 'sampled':
+            self.record = self._record_sampled
+        else:
+            self.record = self._record_trace
+
+    def _record_off(self, prev_position, position, prev_value, value, depth):
+        pass
+
+    def _count(self, prev_position, position, prev_value, value, depth):
+        self.nodes += 1
+        if depth < self.last_depth:
+            self.backtracks += 1
+        elif depth > self.max_depth:
+            self.max_depth = depth
+        self.last_depth = depth
+        self.histogram[position] = self.histogram.get(position, 0) + 1
+
+    def _record_sampled(self, prev_position, position, prev_value, value, depth):
+        self._count(prev_position, position, prev_value, value, depth)
+        if self.nodes % self.sample_every == 0:
+            self._keep(prev_position, position, prev_value, value)
+
+    def _record_trace(self, prev_position, position, prev_value, value, depth):
+        self._count(prev_position, position, prev_value, value, depth)
+        self._keep(prev_position, position, prev_value, value)
+
+    def _keep(self, prev_position, position, prev_value, value):
+        if self.capacity is None:
+            self.node_numbers.append(self.nodes)
+            self.prev_positions.append(prev_position)
+            self.positions.append(position)
+            self.prev_values.append(prev_value)
+            self.values.append(value)
+        else:
+            k = self.kept % self.capacity
+            self.node_numbers[k] = self.nodes
+            self.prev_positions[k] = prev_position
+            self.positions[k] = position
+            self.prev_values[k] = prev_value
+            self.values[k] = value
+        self.kept += 1
+
+    def trace(self):
+        """
+        Returns the kept nodes, oldest first, as (node_number, prev_position,
+        position, prev_value, value) tuples. Node numbers start at 1.
+        """
+        if self.capacity is None or self.kept <= self.capacity:
+            order = range(self.kept)
+        else:
+            start = self.kept % self.capacity
+            order = list(range(start, self.capacity)) + list(range(start))
+        return [(self.node_numbers[k], self.prev_positions[k], self.positions[k], self.prev_values[k],
+                 self.values[k]) for k in order]
+
+    def evaluations(self, n_positions):
+        """
+        Returns the number of evaluations of each of the first n_positions cells
+        """
+        return [self.histogram.get(p, 0) for p in range(n_positions)]
+
+    def counters(self):
+        return {'nodes': self.nodes, 'backtracks': self.backtracks, 'max_depth': self.max_depth}
+
+    def __getitem__(self, key):
+        if key == 'index':
+            return [(node[1], node[2]) for node in self.trace()]
+        if key == 'values':
+            return [(node[3], node[4]) for node in self.trace()]
+        return self.extras[key]
+
+    def __setitem__(self, key, value):
+        self.extras[key] = value
+
+    def __contains__(self, key):
+        return key in ('index', 'values') or key in self.extras
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __eq__(self, other):
+        return (isinstance(other, SolveStats) and self.counters() == other.counters() and
+                self.histogram == other.histogram and self.trace() == other.trace() and
+                self.extras == other.extras)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class DictStats(SolveStats):
+    """
+    SolveStats that also fills a plain stats dict in the shape used before
+    SolveStats: stats['index'] and stats['values'] get a (prev_position,
+    position) and a (prev_value, value) tuple for every node, and any other
+    key is stored in the dict
+    """
+
+    def __init__(self, stats):
+        SolveStats.__init__(self, 'counters')
+        self.stats = stats
+        self.stats.setdefault('index', [])
+        self.stats.setdefault('values', [])
+        self.record = self._record_dict
+
+    def _record_dict(self, prev_position, position, prev_value, value, depth):
+        self._count(prev_position, position, prev_value, value, depth)
+        self.stats['index'].append((prev_position, position))
+        self.stats['values'].append((prev_value, value))
+
+    def __getitem__(self, key):
+        return self.stats[key]
+
+    def __setitem__(self, key, value):
+        self.stats[key] = value
+
+    def __contains__(self, key):
+        return key in self.stats
+
+    def __eq__(self, other):
+        if isinstance(other, DictStats):
+            other = other.stats
+        return self.stats == other
+
+
+def as_stats(stats):
+    """
+    Returns stats as a SolveStats, wrapping a plain stats dict in DictStats
+    """
+    if isinstance(stats, dict):
+        return DictStats(stats)
+    return stats
@@ -0,0 +1,129 @@
+"""
+This module validates many Sudoku grids at once and computes the
+candidates of their unfilled cells. With NumPy installed, N grids of
+the same size are stacked into an (N, size, size) uint8 array and the
+rows, columns and regions of the whole batch are checked with a few
+vectorized operations. Without NumPy, or with use_numpy=False, the
+grids are handled one at a time by the pure Python code of
+sudokusolver and constraints, with the same results.
+
+Digits are mapped to bits as in constraints.py: digit n is bit n - 1
+and an unfilled cell has no bit. A unit of size cells is complete when
+the bitwise OR of its bits has all size bits set, since size cells can
+only cover size different digits if each digit appears exactly once.
+
+Stacking the grids has a fixed cost, so small batches are quicker in
+pure Python; benchmark.py reports the batch size where NumPy takes over.
+"""
+__author__ = 'krishnakumarramamoorthy'
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import sudokusolver as solver
+from .constraints import ConstraintState, BITS
+from .geometry import box_size_of, get_geometry
+
+# bit of each uint8 cell value; values above the largest digit have no bit
+if numpy is not None:
+    BIT_TABLE = numpy.array(BITS + (0,) * (256 - len(BITS)), dtype=numpy.uint32)
+
+
+def validate_solutions(grids, use_numpy=None):
+    """
+    Returns one bool per grid: True if the grid is a complete solution,
+    with every digit once in each row, column and region. grids is a list
+    of matrices of the same size or an (N, size, size) array. NumPy is
+    used when use_numpy is set or, by default, when it is installed.
+    """
+    if len(grids) == 0:
+        return []
+    if _use_numpy(use_numpy):
+        return validate_array(stack(grids)).tolist()
+    return [_is_solution(grid) for grid in grids]
+
+
+def candidate_masks(grids, use_numpy=None):
+    """
+    Returns the candidate mask of every cell of every grid, indexed as
+    masks[k][i][j]: the digits that can still be placed in the cell, as
+    in ConstraintState.candidates, or 0 for filled cells. The masks are
+    an (N, size, size) uint32 array when NumPy is used and a list of
+    matrices otherwise.
+    """
+    if len(grids) == 0:
+        return []
+    if _use_numpy(use_numpy):
+        return candidate_array(stack(grids))
+    masks = []
+    for grid in grids:
+        state = ConstraintState(grid)
+        masks.append([[state.candidates(i, j) if grid[i][j] == 0 else 0 for j in range(len(grid))]
+                      for i in range(len(grid))])
+    return masks
+
+
+def stack(grids):
+    """
+    Returns the grids, all of the same size, as an (N, size, size) uint8 array
+    """
+    assert numpy is not None, 'NumPy is not installed'
+    if isinstance(grids, numpy.ndarray) and grids.dtype == numpy.uint8:
+        array = grids
+    else:
+        array = numpy.array(grids, dtype=numpy.uint8)
+    assert array.ndim == 3 and array.shape[1] == array.shape[2], 'Grids should be square and of the same size'
+    assert box_size_of(array.shape[1]) is not None, 'Grids do not have 4, 9, 16 or 25 rows'
+    return array
+
+
+def validate_array(array):
+    """
+    Vectorized validate_solutions of an (N, size, size) uint8 array.
+    Returns an array of N bools.
+    """
+    size = array.shape[1]
+    all_digits = (1 << size) - 1
+    (rows, cols, boxes) = _unit_masks(BIT_TABLE[array], box_size_of(size))
+    return (rows == all_digits).all(axis=1) & (cols == all_digits).all(axis=1) & \
+        (boxes == all_digits).all(axis=1)
+
+
+def candidate_array(array):
+    """
+    Vectorized candidate_masks of an (N, size, size) uint8 array
+    """
+    size = array.shape[1]
+    geometry = get_geometry(box_size_of(size))
+    (rows, cols, boxes) = _unit_masks(BIT_TABLE[array], geometry.box_size)
+    used = rows[:, :, None] | cols[:, None, :] | boxes[:, numpy.array(geometry.box_at)]
+    return numpy.where(array == 0, numpy.uint32(geometry.all_digits) & ~used, numpy.uint32(0))
+
+
+def _unit_masks(bits, box_size):
+    """
+    Returns the (N, size) used-digit masks of the rows, columns and
+    regions of an (N, size, size) array of cell bits
+    """
+    (n, size) = bits.shape[:2]
+    # (grid, box row, row in box, box col, col in box) -> one row per region
+    regions = bits.reshape(n, box_size, box_size, box_size, box_size).transpose(0, 1, 3, 2, 4).reshape(n, size, size)
+    return (numpy.bitwise_or.reduce(bits, axis=2), numpy.bitwise_or.reduce(bits, axis=1),
+            numpy.bitwise_or.reduce(regions, axis=2))
+
+
+def _use_numpy(use_numpy):
+    if use_numpy is None:
+        return numpy is not None
+    assert not use_numpy or numpy is not None, 'NumPy is not installed'
+    return use_numpy
+
+
+def _is_solution(grid):
+    try:
+        solver.validate_solution(grid)
+    except AssertionError:
+        return False
+    return True
@@ -5,7 +5,7 @@ Sudoku solver dependency on numpy.
 """
 __author__ = 'krishnakumarramamoorthy'
 
-import random
+from .geometry import ROW_OF, COL_OF, BOX_CELLS
 
 
 def copy(matrix):
@@ -41,7 +41,8 @@ def where(matrix, val):
                 if matrix[i][j] == val:
                     xmatches.append(i)
                     ymatches.append(j)
-    except:
+    except TypeError:
+        # a 1-D matrix: its rows have no len
         for i in range(row):
             if matrix[i] == val:
                 xmatches.append(i)
@@ -61,23 +62,16 @@ def loadtxt(path, **kwargs):
                     temp.append(int(item))
                 matrix.append(temp)
     except IOError:
-        print 'Cannot find input file in default location ./data/input.csv'
+        print('Cannot find input file in default location ./data/input.csv')
         raise
 
     return matrix
 
 
 def savetxt(path, matrix, **kwargs):
+    delimiter = kwargs.get('delimiter', ',')
     with open(path, 'w') as f:
-        text = ''
-
-        for array in matrix:
-            for val in array:
-                text += str(val) + ','
-            text = text[0:-1]
-            text += '\n'
-
-        f.write(text)
+        f.writelines(delimiter.join(str(val) for val in array) + '\n' for array in matrix)
 
 
 def get_sub_matrix(matrix, start_row, end_row, start_col, end_col):
@@ -107,6 +101,8 @@ def randn(x, y, max_val):
     """
     Fill random integers in x-by-y matrix with maximum integer of max_val
     """
+    # random is slow to import and only needed here
+    import random
     matrix = []
 
     for i in range(x):
@@ -142,4 +138,78 @@ def comparematrix(a, b):
             if a[i][j] != b[i][j]:
                 return False
 
-    return True
\ No newline at end of file
+    return True
+
+
+class Grid(object):
+    """
+    Compact 9x9 sudoku grid stored as 81 bytes, row by row. Cells can be
+    accessed by (row, col) or by cell index (i * 9 + j) in constant time,
+    and copies are a single buffer copy. Use from_matrix and to_matrix to
+    convert from and to the list of lists used elsewhere. Only 9x9 grids
+    are supported; grids of other sizes stay lists of lists.
+    """
+    __slots__ = ('cells',)
+
+    def __init__(self, cells=None):
+        self.cells = bytearray(cells) if cells is not None else bytearray(81)
+        assert len(self.cells) == 81, 'Grid does not have 81 cells: only 9x9 grids are supported'
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        return cls(val for row in matrix for val in row)
+
+    @classmethod
+    def from_string(cls, line):
+        """
+        Builds a grid from 81 characters with 0 or . for unfilled cells
+        """
+        return cls(0 if c == '.' else int(c) for c in line)
+
+    def to_matrix(self):
+        cells = self.cells
+        return [list(cells[i * 9:i * 9 + 9]) for i in range(9)]
+
+    def to_string(self):
+        return ''.join(str(val) for val in self.cells)
+
+    def get(self, i, j):
+        return self.cells[i * 9 + j]
+
+    def set(self, i, j, n):
+        self.cells[i * 9 + j] = n
+
+    def __getitem__(self, c):
+        return self.cells[c]
+
+    def __setitem__(self, c, n):
+        self.cells[c] = n
+
+    def __len__(self):
+        return 81
+
+    def __eq__(self, other):
+        return isinstance(other, Grid) and self.cells == other.cells
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        return Grid(self.cells)
+
+    def row(self, i):
+        return self.cells[i * 9:i * 9 + 9]
+
+    def col(self, j):
+        return self.cells[j::9]
+
+    def box(self, b):
+        cells = self.cells
+        return bytearray(cells[c] for c in BOX_CELLS[b])
+
+    def where(self, val):
+        """
+        Same as where(matrix, val) for the equivalent matrix
+        """
+        matches = [c for c in range(81) if self.cells[c] == val]
+        return [[ROW_OF[c] for c in matches], [COL_OF[c] for c in matches]]
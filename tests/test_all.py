@@ -10,9 +10,33 @@ Tests for `sudokusolver`, `plotutilities` and  `xumpy`.
 
 import unittest
 import os
+import sys
+import subprocess
+import tempfile
+import shutil
+import random
+import argparse
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from sudokusolver import sudokusolver
 from sudokusolver import xumpy as np
+from sudokusolver.constraints import ConstraintState
+from sudokusolver.tracing import SolveStats
+from sudokusolver.instrumentation import Instrumentation
+from sudokusolver import batch
+from sudokusolver import parallel
+from sudokusolver import streamio
+from sudokusolver import geometry
+from sudokusolver import cache
+from sudokusolver import generator
+from sudokusolver import benchsuite
+from sudokusolver import vectorized
+from sudokusolver import service
+from sudokusolver import budget
+from sudokusolver import gridfile
+from sudokusolver import session
 
 
 class TestAll(unittest.TestCase):
@@ -103,3 +127,494 @@ class TestAll(unittest.TestCase):
         self.assertTrue(np.comparematrix(matrixa, matrixb), 'Compare matrix not working correctly')
         matrixa[0][2] = 1
         self.assertFalse(np.comparematrix(matrixa, matrixb), 'Compare matrix not working correctly')
+
+    def test_constraint_state(self):
+        state = ConstraintState(self.test_problem)
+        for (i, j) in zip(self.zero_indices[0], self.zero_indices[1]):
+            for n in range(1, 10):
+                self.assertEqual(state.allows(i, j, n), sudokusolver.evaluate_solution(self.test_problem, i, j, n),
+                                 'Constraint state disagrees with evaluate solution.')
+        state.place(0, 0, 1)
+        self.assertFalse(state.allows(0, 8, 1), 'Constraint state place not working correctly')
+        state.remove(0, 0, 1)
+        self.assertTrue(state.allows(0, 8, 1), 'Constraint state remove not working correctly')
+
+    def test_solver_mrv(self):
+        [solved_matrix, stats] = sudokusolver.solve_mrv(self.test_problem, self.zero_indices, self.stats)
+        self.assertEqual(np.comparematrix(solved_matrix, self.expected_solution), True, 'MRV solution incorrect.')
+        self.assertTrue(all(0 <= pair[1] < 26 for pair in stats['index']), 'MRV trace does not use zero indices.')
+
+    def test_solver_iterative(self):
+        [solved_matrix, stats] = sudokusolver.solve_iterative(np.copy(self.test_problem), self.zero_indices,
+                                                              {'index': [], 'values': []})
+        self.assertEqual(np.comparematrix(solved_matrix, self.expected_solution), True, 'Solution incorrect.')
+        [solved_matrix, expected_stats] = sudokusolver.solve(self.test_problem, self.zero_indices,
+                                                             self.current_zero_index, self.stats)
+        self.assertEqual(stats, expected_stats, 'Iterative solver trace differs from recursive solver.')
+
+    def test_solver_propagate(self):
+        [solved_matrix, stats] = sudokusolver.solve_propagate(self.test_problem, self.zero_indices, self.stats)
+        self.assertEqual(np.comparematrix(solved_matrix, self.expected_solution), True, 'Solution incorrect.')
+        self.assertEqual(stats['propagated'], 26, 'Test problem should be solved by propagation alone.')
+        self.assertEqual(len(stats['index']), 0, 'Propagation should not need any guesses.')
+
+    def test_solve_puzzle_strategies(self):
+        for strategy in sudokusolver.STRATEGIES:
+            [solved_matrix, stats] = sudokusolver.solve_puzzle(self.test_problem, self.zero_indices, strategy)
+            self.assertEqual(np.comparematrix(solved_matrix, self.expected_solution), True,
+                             'Solution incorrect for strategy {}.'.format(strategy))
+            self.assertTrue(self.test_problem[0][0] == 0, 'Solve puzzle should not modify the input matrix.')
+
+    def test_parse_format_puzzle(self):
+        line = batch.format_puzzle(self.test_problem)
+        self.assertEqual(len(line), 81, 'Format puzzle not working correctly')
+        self.assertTrue(np.comparematrix(batch.parse_puzzle(line.replace('0', '.')), self.test_problem),
+                        'Parse puzzle not working correctly')
+
+    def test_solve_batch(self):
+        folder = tempfile.mkdtemp()
+        try:
+            with open(folder + '/puzzles.txt', 'w') as f:
+                f.write(batch.format_puzzle(self.test_problem) + '\n\n' + '1' * 80 + '\n')
+            counts = batch.solve_batch(folder + '/puzzles.txt', folder + '/solutions.txt')
+            self.assertEqual(counts, {'solved': 1, 'invalid': 1}, 'Solve batch counts incorrect.')
+            with open(folder + '/solutions.txt') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0].split(',')[:2], [batch.format_puzzle(self.expected_solution), 'solved'],
+                             'Solve batch output incorrect.')
+            self.assertEqual(lines[1].split(',')[:2], ['', 'invalid'], 'Solve batch output incorrect.')
+        finally:
+            shutil.rmtree(folder)
+
+    def test_solve_parallel(self):
+        folder = tempfile.mkdtemp()
+        try:
+            problem = batch.format_puzzle(self.test_problem)
+            with open(folder + '/puzzles.txt', 'w') as f:
+                f.write((problem + '\n' + '1' * 81 + '\n') * 5)
+            summary = parallel.solve_parallel(folder + '/puzzles.txt', folder + '/solutions.txt',
+                                              processes=2, chunksize=3)
+            self.assertEqual(summary['counts'], {'solved': 5, 'invalid': 5}, 'Solve parallel counts incorrect.')
+            with open(folder + '/solutions.txt') as f:
+                statuses = [line.split(',')[1] for line in f]
+            self.assertEqual(statuses, ['solved', 'invalid'] * 5, 'Solve parallel did not keep input order.')
+        finally:
+            shutil.rmtree(folder)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(parallel.percentile(values, 50), 50, 'Percentile not working correctly')
+        self.assertEqual(parallel.percentile(values, 99), 99, 'Percentile not working correctly')
+        self.assertEqual(parallel.percentile([], 99), 0.0, 'Percentile not working correctly')
+
+    def test_latency_histogram(self):
+        latencies = parallel.LatencyHistogram()
+        for n in range(1, 101):
+            latencies.add(n / 1000.0)
+        self.assertAlmostEqual(latencies.percentile(50), 0.050, delta=0.050 * 0.05, msg='Histogram p50 incorrect')
+        self.assertAlmostEqual(latencies.percentile(99), 0.099, delta=0.099 * 0.05, msg='Histogram p99 incorrect')
+
+    def test_stream_csv_matrices(self):
+        with open(self.project_root + '/data/test_problem.csv') as f:
+            text = f.read()
+        folder = tempfile.mkdtemp()
+        try:
+            with open(folder + '/problems.csv', 'w') as f:
+                f.write(text + '\n' + text)
+            stream = streamio.open_input(folder + '/problems.csv')
+            matrices = list(streamio.read_csv_matrices(stream))
+            streamio.close(stream)
+            self.assertEqual(len(matrices), 2, 'Read csv matrices count incorrect.')
+            self.assertTrue(np.comparematrix(matrices[1], self.test_problem), 'Read csv matrices incorrect.')
+            small = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]]
+            with open(folder + '/problems.csv', 'a') as f:
+                f.write(''.join(','.join(str(val) for val in row) + '\n' for row in small))
+            with open(folder + '/problems.csv') as f:
+                self.assertEqual(list(streamio.read_csv_matrices(f))[2], small, 'Read csv 4x4 matrix incorrect.')
+            stream = streamio.open_output(folder + '/lines.txt')
+            self.assertEqual(streamio.write_lines(stream, ('{}\n'.format(n) for n in range(5)), flush_every=2), 5)
+            streamio.close(stream)
+            with open(folder + '/lines.txt') as f:
+                self.assertEqual(f.read(), '0\n1\n2\n3\n4\n', 'Write lines output incorrect.')
+        finally:
+            shutil.rmtree(folder)
+
+    def test_grid(self):
+        grid = np.Grid.from_matrix(self.test_problem)
+        self.assertTrue(np.comparematrix(grid.to_matrix(), self.test_problem), 'Grid conversion not working correctly')
+        self.assertEqual(grid.where(0), np.where(self.test_problem, 0), 'Grid where not working correctly')
+        self.assertEqual(np.Grid.from_string(grid.to_string()), grid, 'Grid string conversion not working correctly')
+        copy = grid.copy()
+        copy.set(0, 0, 1)
+        self.assertEqual(grid.get(0, 0), 0, 'Grid copy not working correctly')
+        self.assertEqual(copy[0], 1, 'Grid set not working correctly')
+        self.assertEqual(list(grid.col(1)), [row[1] for row in self.test_problem], 'Grid col not working correctly')
+        self.assertEqual(list(grid.box(4)), sum(np.get_sub_matrix(self.test_problem, 3, 6, 3, 6), []),
+                         'Grid box not working correctly')
+
+    def test_geometry(self):
+        self.assertEqual(len(geometry.UNITS), 27, 'Geometry should have 27 units')
+        self.assertTrue(all(len(peers) == 20 for peers in geometry.PEERS), 'Every cell should have 20 peers')
+        self.assertEqual(geometry.BOX_OF[4 * 9 + 5], 4, 'Geometry region not working correctly')
+        self.assertTrue(40 in geometry.PEER_SETS[30] and 40 not in geometry.PEER_SETS[60],
+                        'Geometry peers not working correctly')
+
+    def test_validate_solution_regions(self):
+        # swapping two columns within a band keeps rows and columns unique but breaks the regions
+        temp = [row[:] for row in self.expected_solution]
+        for row in temp:
+            row[2], row[3] = row[3], row[2]
+        self.assertRaises(AssertionError, sudokusolver.validate_solution, temp)
+        # a grid without 4, 9, 16 or 25 rows has no regions to check
+        temp = [list(range(1, 11)) for _ in range(10)]
+        self.assertRaises(AssertionError, sudokusolver.validate_solution, temp)
+        self.assertRaises(AssertionError, sudokusolver.evaluate_solution, temp, 0, 0, 1)
+
+    def test_canonicalize(self):
+        # transpose, swap two rows within a band and relabel the digits
+        variant = [list(row) for row in zip(*self.test_problem)]
+        variant[0], variant[2] = variant[2], variant[0]
+        relabel = [0, 9, 8, 7, 6, 5, 4, 3, 2, 1]
+        variant = [[relabel[val] for val in row] for row in variant]
+        [canonical, transform] = cache.canonicalize(self.test_problem)
+        [variant_canonical, variant_transform] = cache.canonicalize(variant)
+        self.assertEqual(canonical, variant_canonical, 'Canonical forms of equivalent puzzles differ.')
+        self.assertEqual(cache.invert_transform(cache.apply_transform(variant, variant_transform), variant_transform),
+                         variant, 'Inverse transform not working correctly')
+
+    def test_solution_cache(self):
+        variant = [row[:] for row in self.test_problem]
+        variant[0], variant[1] = variant[1], variant[0]
+        solution_cache = cache.SolutionCache(capacity=1)
+        solution_cache.solve(self.test_problem, self.zero_indices)
+        [solved_matrix, stats] = solution_cache.solve(variant, np.where(variant, 0))
+        self.assertTrue(stats['cached'], 'Equivalent puzzle should be a cache hit.')
+        expected = [row[:] for row in self.expected_solution]
+        expected[0], expected[1] = expected[1], expected[0]
+        self.assertTrue(np.comparematrix(solved_matrix, expected), 'Cached solution mapped back incorrectly.')
+        other = self.expected_solution[:8] + [[0] * 9]
+        solution_cache.solve(other, np.where(other, 0))
+        self.assertEqual(solution_cache.counters(), {'hits': 1, 'misses': 2, 'evictions': 1, 'size': 1},
+                         'Cache counters incorrect.')
+        folder = tempfile.mkdtemp()
+        try:
+            solution_cache.save(folder + '/cache.txt')
+            self.assertEqual(cache.SolutionCache(path=folder + '/cache.txt').entries, solution_cache.entries,
+                             'Cache persistence not working correctly')
+        finally:
+            shutil.rmtree(folder)
+
+    def test_count_solutions(self):
+        self.assertEqual(sudokusolver.count_solutions(self.test_problem), 1, 'Test problem should be proper.')
+        self.assertEqual(sudokusolver.count_solutions(np.zeros(9, 9), 5), 5, 'Count should stop at the limit.')
+        temp = np.copy(self.test_problem)
+        temp[0][0] = temp[0][1]
+        self.assertEqual(sudokusolver.count_solutions(temp), 0, 'Conflicting clues should have no solution.')
+        self.assertEqual(self.test_problem[0][0], 0, 'Count solutions should not modify the matrix.')
+        folder = tempfile.mkdtemp()
+        try:
+            with open(folder + '/puzzles.txt', 'w') as f:
+                f.write(batch.format_puzzle(self.test_problem) + '\n' + '0' * 81 + '\n')
+            counts = batch.solve_batch(folder + '/puzzles.txt', folder + '/solutions.txt', unique=True)
+            self.assertEqual(counts, {'solved': 1, 'ambiguous': 1}, 'Unique admission check not working correctly')
+        finally:
+            shutil.rmtree(folder)
+
+    def test_generate_puzzle(self):
+        [puzzle, difficulty, nodes] = generator.generate_puzzle(3, 0)
+        self.assertEqual(sudokusolver.count_solutions(puzzle), 1, 'Generated puzzle should be proper.')
+        self.assertTrue(difficulty in ('easy', 'medium', 'hard', 'expert'), 'Difficulty label incorrect.')
+        self.assertEqual(generator.generate_puzzle(3, 0), [puzzle, difficulty, nodes],
+                         'Generator should be reproducible for a seed.')
+        sudokusolver.validate_solution(generator.random_full_grid(random.Random(1)))
+
+    def test_generalized_sizes(self):
+        small = [[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]
+        for strategy in sudokusolver.STRATEGIES:
+            [solved, stats] = sudokusolver.solve_puzzle(small, np.where(small, 0), strategy)
+            sudokusolver.validate_solution(solved)
+            self.assertEqual(solved[0][0], 1, '4x4 solve with {} changed a clue.'.format(strategy))
+        self.assertEqual(sudokusolver.count_solutions(small), 1, '4x4 puzzle should be proper.')
+        [input_matrix, zero_indices] = sudokusolver.load_input(self.project_root + '/data/input_16.csv')
+        for strategy in ('propagate', 'dlx'):
+            [solved, stats] = sudokusolver.solve_puzzle(input_matrix, zero_indices, strategy)
+            sudokusolver.validate_solution(solved)
+        self.assertEqual(batch.parse_puzzle(batch.format_puzzle(input_matrix)), input_matrix,
+                         '16x16 puzzle line round trip not working correctly')
+        sudokusolver.validate_solution(generator.random_full_grid(random.Random(1), 5))
+        self.assertRaises(AssertionError, sudokusolver.validate_input, [[0] * 10 for _ in range(10)])
+        self.assertRaises(AssertionError, sudokusolver.validate_input, [[5, 0, 0, 0]] * 4)
+
+    def test_solve_stats(self):
+        [solved_matrix, full] = sudokusolver.solve_puzzle(self.test_problem, self.zero_indices, 'backtrack')
+        self.assertEqual(full.nodes, len(full['index']), 'Full trace should keep every node.')
+        self.assertEqual(sum(full.histogram.values()), full.nodes, 'Evaluation histogram incorrect.')
+        self.assertTrue(0 < full.max_depth <= 26 and 0 < full.backtracks < full.nodes, 'Stats counters incorrect.')
+        for level in ('off', 'counters', 'sampled'):
+            [solved_matrix, stats] = sudokusolver.solve_puzzle(self.test_problem, self.zero_indices, 'backtrack',
+                                                               SolveStats(level, sample_every=10))
+            self.assertEqual(np.comparematrix(solved_matrix, self.expected_solution), True, 'Solution incorrect.')
+            if level == 'off':
+                self.assertEqual(stats.nodes, 0, 'Stats level off should not count nodes.')
+            else:
+                self.assertEqual(stats.counters(), full.counters(), 'Counters depend on the stats level.')
+        self.assertEqual(len(stats.trace()), full.nodes // 10, 'Sampled trace incorrect.')
+        [solved_matrix, ring] = sudokusolver.solve_puzzle(self.test_problem, self.zero_indices, 'backtrack',
+                                                          SolveStats(capacity=50))
+        self.assertEqual(ring.trace(), full.trace()[-50:], 'Ring buffer should keep the latest nodes.')
+        legacy = {'index': [], 'values': []}
+        sudokusolver.solve_puzzle(self.test_problem, self.zero_indices, 'backtrack', legacy)
+        self.assertEqual(legacy['index'], full['index'], 'Plain stats dict not filled.')
+        # the search runs out of candidates twice: at cell [0,3], going back to [0,1], and at [1,1],
+        # going back to [1,0];
+        # the other failed candidates are retried in the same cell and are not backtracks
+        small = [[1, 0, 0, 0], [0, 0, 3, 0], [0, 4, 0, 0], [0, 0, 0, 2]]
+        [solved_matrix, stats] = sudokusolver.solve_puzzle(small, np.where(small, 0), 'backtrack')
+        self.assertEqual(stats.counters(), {'nodes': 42, 'backtracks': 2, 'max_depth': 12},
+                         'Backtracks should only count the search going back to an earlier cell.')
+
+    def test_instrumentation(self):
+        records = []
+        instrumentation = Instrumentation(callback=records.append, context={'puzzle': 'test'})
+        [input_matrix, zero_indices] = sudokusolver.load_input(self.project_root + '/data/input_hard.csv',
+                                                               instrumentation)
+        [solved_matrix, stats] = sudokusolver.solve_puzzle(input_matrix, zero_indices, 'propagate',
+                                                           SolveStats('counters'), instrumentation)
+        self.assertEqual([record['phase'] for record in records], ['load', 'validate', 'propagate', 'search'],
+                         'Phases not recorded in order.')
+        self.assertEqual(sum(record['nodes'] for record in records), stats.nodes, 'Phase node counts incorrect.')
+        self.assertTrue(all(record['ns'] >= 0 and record['puzzle'] == 'test' for record in records),
+                        'Phase records incorrect.')
+        self.assertEqual(instrumentation.totals['search']['runs'], 1, 'Phase totals incorrect.')
+        args = argparse.Namespace(timings=None, profile=tempfile.gettempdir(), trace_memory=False, path='test',
+                                  strategy='propagate')
+        self.assertEqual(sudokusolver.create_instrumentation(args).stream, None,
+                         'Profiling alone should not write timings.')
+        args.profile = None
+        self.assertTrue(sudokusolver.create_instrumentation(args) is sudokusolver.NO_INSTRUMENTATION,
+                        'Run without timings or profiles should not be instrumented.')
+
+    def test_benchsuite(self):
+        result = benchsuite.run_corpus([self.test_problem], 'propagate', repeat=2)
+        self.assertEqual(result['puzzles'], 1, 'Benchmark corpus size incorrect.')
+        self.assertTrue(result['puzzles_per_sec'] > 0 and result['median_ms'] <= result['p99_ms'],
+                        'Benchmark figures incorrect.')
+        baseline = {'results': [{'corpus': 'hard', 'strategy': 'dlx', 'puzzles_per_sec': 100.0, 'p99_ms': 10.0}]}
+        report = {'results': [{'corpus': 'hard', 'strategy': 'dlx', 'puzzles_per_sec': 70.0, 'p99_ms': 11.0}]}
+        self.assertEqual(len(benchsuite.compare(report, baseline, 0.25)), 1, 'Throughput regression not found.')
+        self.assertEqual(benchsuite.compare(report, baseline, 0.5), [], 'Regression threshold not applied.')
+
+    def test_startup(self):
+        startup = benchsuite.measure_startup(self.project_root, self.project_root + '/data/input.csv', repeat=1)
+        self.assertEqual(startup['heavy_modules'], [], 'Solver import loads a heavyweight module.')
+        self.assertTrue(startup['import_ms'] > 0, 'Import time not measured.')
+        slow = {'solve_ms': 80.0, 'heavy_modules': ['matplotlib']}
+        self.assertEqual(len(benchsuite.check_startup(slow, 50.0)), 2, 'Startup budget not checked.')
+
+    def test_vectorized(self):
+        invalid = np.copy(self.expected_solution)
+        invalid[0][0], invalid[0][1] = invalid[0][1], invalid[0][0]
+        grids = [self.expected_solution, invalid, self.test_problem]
+        self.assertEqual(vectorized.validate_solutions(grids, use_numpy=False), [True, False, False],
+                         'Batch validation incorrect.')
+        masks = vectorized.candidate_masks([self.test_problem], use_numpy=False)[0]
+        state = ConstraintState(self.test_problem)
+        for (i, j) in zip(self.zero_indices[0], self.zero_indices[1]):
+            self.assertEqual(masks[i][j], state.candidates(i, j), 'Batch candidates incorrect.')
+        self.assertEqual(masks[0][1], 0, 'Filled cell should have no candidates.')
+        if vectorized.numpy is not None:
+            self.assertEqual(vectorized.validate_solutions(grids, use_numpy=True), [True, False, False],
+                             'NumPy batch validation incorrect.')
+            self.assertEqual(vectorized.candidate_masks([self.test_problem], use_numpy=True).tolist(), [masks],
+                             'NumPy batch candidates incorrect.')
+
+    def test_service(self):
+        line = batch.format_puzzle(self.test_problem)
+        solution = batch.format_puzzle(self.expected_solution)
+        temp_dir = tempfile.mkdtemp()
+        solver_service = service.SolverService(workers=1, max_pending=0, deadline=5.0)
+
+        async def run():
+            servers = await service.serve(solver_service, temp_dir + '/solver.sock', 0)
+            try:
+                (reader, writer) = await asyncio.open_unix_connection(temp_dir + '/solver.sock')
+                writer.write((line + '\n' + json.dumps({'puzzle': line[:80]}) + '\n').encode('ascii'))
+                responses = [json.loads((await reader.readline()).decode('ascii')) for _ in range(2)]
+                writer.close()
+                port = servers[1].sockets[0].getsockname()[1]
+                (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+                body = json.dumps({'puzzle': line, 'strategy': 'dlx'})
+                request = 'POST /solve HTTP/1.1\r\nContent-Length: {}\r\n\r\n{}'.format(len(body), body)
+                writer.write(request.encode('ascii'))
+                http_response = (await reader.read()).decode('ascii')
+                writer.close()
+                solver_service.pending = 1
+                busy = await solver_service.solve(line)
+                solver_service.pending = 0
+                return (responses, http_response, busy)
+            finally:
+                for server in servers:
+                    server.close()
+
+        try:
+            (responses, http_response, busy) = asyncio.run(run())
+        finally:
+            solver_service.close()
+            shutil.rmtree(temp_dir)
+        self.assertEqual((responses[0]['status'], responses[0]['solution']), ('solved', solution),
+                         'Service did not solve the puzzle.')
+        self.assertEqual(responses[1]['status'], 'invalid', 'Service accepted an invalid puzzle.')
+        self.assertTrue(http_response.startswith('HTTP/1.1 200') and solution in http_response,
+                        'HTTP front end did not solve the puzzle.')
+        self.assertEqual(busy['status'], 'busy', 'Service did not push back when full.')
+
+    def test_service_error(self):
+        line = batch.format_puzzle(self.test_problem)
+        solver_service = service.SolverService(workers=1, deadline=5.0)
+
+        def fail(task):
+            raise RuntimeError('worker failed')
+
+        async def run():
+            solver_service.start()
+            solver_service.close()
+            solver_service.pool = ThreadPoolExecutor(1)
+            solve_line = parallel._solve_line
+            parallel._solve_line = fail
+            try:
+                failed = await solver_service.solve(line)
+            finally:
+                parallel._solve_line = solve_line
+            solver_service.pool.shutdown()
+            # a pool that was shut down refuses new work
+            refused = await solver_service.solve(line)
+            return (failed, refused)
+
+        (failed, refused) = asyncio.run(run())
+        self.assertEqual((failed['status'], failed['error']), ('error', 'RuntimeError: worker failed'),
+                         'Worker failure not answered.')
+        self.assertEqual(refused['status'], 'error', 'Broken pool not answered.')
+        self.assertEqual(solver_service.counts['error'], 2, 'Errors not counted.')
+        self.assertEqual(service.HTTP_STATUS['error'], 500, 'Errors should be answered with HTTP 500.')
+        for deadline in (0, -1, float('nan'), float('inf'), 'soon'):
+            self.assertRaises((AssertionError, ValueError), solver_service.parse_request,
+                              {'puzzle': line, 'deadline': deadline})
+        self.assertEqual(solver_service.parse_request({'puzzle': line, 'deadline': 60})[2], 5.0,
+                         'Deadline should be capped by the service deadline.')
+        invalid = asyncio.run(solver_service.solve({'puzzle': line, 'deadline': -1}))
+        self.assertEqual(invalid['status'], 'invalid', 'Service accepted a negative deadline.')
+
+    def test_solve_with_budget(self):
+        full = sudokusolver.solve_with_budget(self.test_problem, self.zero_indices, 'backtrack')
+        self.assertEqual((full['status'], full['solution']), ('solved', self.expected_solution),
+                         'Solve without limits should finish.')
+        limited = sudokusolver.solve_with_budget(self.test_problem, self.zero_indices, 'backtrack',
+                                                 budget.Budget(max_nodes=full['nodes'] - 1))
+        self.assertEqual((limited['status'], limited['reason'], limited['nodes']),
+                         ('exhausted', 'nodes', full['nodes'] - 1), 'Node budget not enforced.')
+        self.assertEqual(limited['stats'].nodes, full['nodes'] - 1, 'Nodes past the budget were explored.')
+        token = budget.CancellationToken()
+        token.cancel()
+        for strategy in sudokusolver.STRATEGIES:
+            cancelled = sudokusolver.solve_with_budget(self.test_problem, self.zero_indices, strategy,
+                                                       budget.Budget(deadline=10.0, token=token))
+            self.assertEqual(cancelled['reason'], 'cancelled', 'Cancelled {} solve did not stop.'.format(strategy))
+        progress = []
+        sudokusolver.solve_with_budget(self.test_problem, self.zero_indices, 'backtrack',
+                                       budget.Budget(progress=progress.append, progress_every=20))
+        self.assertEqual([p['nodes'] for p in progress], list(range(20, full['nodes'], 20)),
+                         'Progress callback not called every 20 nodes.')
+        unsolvable = [[1, 1, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+        self.assertEqual(sudokusolver.solve_with_budget(unsolvable, np.where(unsolvable, 0), 'dlx')['status'],
+                         'unsolvable', 'Unsolvable puzzle not reported.')
+
+    def test_main_unsolvable(self):
+        temp_dir = tempfile.mkdtemp()
+        unsolvable = np.copy(self.test_problem)
+        unsolvable[0][0] = unsolvable[0][1]
+        np.savetxt(temp_dir + '/input.csv', unsolvable, fmt='%d', delimiter=',')
+        try:
+            for budget_args in ([], ['--max-nodes', '1000']):
+                run = subprocess.run([sys.executable, '-m', 'sudokusolver.sudokusolver', temp_dir + '/input.csv',
+                                      '--no-plot'] + budget_args, cwd=self.project_root,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+                self.assertEqual(run.returncode, 0, 'Unsolvable puzzle failed: {}'.format(run.stderr))
+                self.assertTrue('No solution found' in run.stdout, 'Unsolvable puzzle not reported.')
+                self.assertFalse(os.path.exists(temp_dir + '/input_out.csv'),
+                                 'Output written for an unsolvable puzzle.')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_gridfile(self):
+        big = [[(i * 4 + i // 4 + j) % 16 + 1 for j in range(16)] for i in range(16)]
+        for grids in ([self.test_problem, self.expected_solution], [big]):
+            size = len(grids[0])
+            self.assertEqual(len(gridfile.pack_grid(grids[0])), gridfile.record_bytes(size), 'Record size incorrect.')
+            self.assertEqual(gridfile.unpack_grid(gridfile.pack_grid(grids[-1]), size), grids[-1],
+                             'Packed grid does not round trip.')
+        self.assertEqual(gridfile.record_bytes(9), 41, '9x9 grids should take 41 bytes.')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with open(temp_dir + '/grids.csv', 'w') as f:
+                for row in self.test_problem + self.expected_solution:
+                    f.write(','.join(str(val) for val in row) + '\n')
+            count = gridfile.write_grids(temp_dir + '/grids.sdk', gridfile.read_csv_grids(temp_dir + '/grids.csv'))
+            self.assertEqual(count, 2, 'Grids not counted.')
+            self.assertEqual(os.path.getsize(temp_dir + '/grids.sdk'), gridfile.HEADER.size + 2 * 41,
+                             'Grid file size incorrect.')
+            with gridfile.GridFile(temp_dir + '/grids.sdk') as grids:
+                self.assertEqual(len(grids), 2, 'Grid file length incorrect.')
+                self.assertEqual(grids[1], self.expected_solution, 'Grid file index incorrect.')
+                self.assertEqual(grids[-2], self.test_problem, 'Negative grid file index incorrect.')
+                self.assertEqual(list(grids.grids(1)), [self.expected_solution], 'Grid range incorrect.')
+                self.assertRaises(IndexError, lambda: grids[2])
+            self.assertRaises(ValueError, gridfile.GridFile, temp_dir + '/grids.csv')
+            with open(temp_dir + '/grids.txt', 'w') as f:
+                f.write(batch.format_puzzle(self.test_problem) + '\n')
+            matrices = (matrix for path in (temp_dir + '/grids.txt', temp_dir + '/grids.csv')
+                        for matrix in gridfile.read_grids(path))
+            self.assertEqual(gridfile.write_grids(temp_dir + '/grids.sdk', matrices, append=True), 3,
+                             'Grids from several files not appended.')
+            with gridfile.GridFile(temp_dir + '/grids.sdk') as grids:
+                self.assertEqual(list(grids.grids(1, 3)), [self.expected_solution, self.test_problem],
+                                 'Appended grids incorrect.')
+                self.assertEqual(len(grids), 5, 'Appended grid file length incorrect.')
+            self.assertRaises(AssertionError, gridfile.write_grids, temp_dir + '/grids.sdk',
+                              [[[0] * 4 for _ in range(4)]], True)
+            for val in (17, -1):
+                bad = np.copy(self.test_problem)
+                bad[0][0] = val
+                self.assertRaises(AssertionError, gridfile.write_grids, temp_dir + '/bad.sdk', [bad])
+            self.assertEqual(gridfile.write_grids(temp_dir + '/none.sdk', []), 0, 'Empty input not counted.')
+            with gridfile.GridFile(temp_dir + '/none.sdk') as grids:
+                self.assertEqual(list(grids), [], 'Empty grid file should have no grids.')
+            small = [[1, 2, 3, 4], [3, 4, 1, 2], [2, 1, 4, 3], [4, 3, 2, 1]]
+            gridfile.write_grids(temp_dir + '/none.sdk', [small], append=True)
+            with gridfile.GridFile(temp_dir + '/none.sdk') as grids:
+                self.assertEqual(list(grids), [small], 'Grids not appended to an empty grid file.')
+            with open(temp_dir + '/empty.sdk', 'wb') as f:
+                f.write(gridfile.HEADER.pack(gridfile.MAGIC, gridfile.VERSION, 0, 4))
+            self.assertRaises(ValueError, gridfile.GridFile, temp_dir + '/empty.sdk')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_solve_session(self):
+        grid = session.SolveSession(self.test_problem)
+        self.assertEqual(grid.solve(), self.expected_solution, 'Session did not solve the puzzle.')
+        (i, j) = (self.zero_indices[0][0], self.zero_indices[1][0])
+        grid.set_cell((i, j), self.expected_solution[i][j])
+        self.assertTrue(grid.is_consistent(), 'Digit of the solution made the grid inconsistent.')
+        self.assertEqual(grid.counts['searched'], 1, 'Compatible solution not reused.')
+        grid.set_cell((i, j), self.expected_solution[i][j] % 9 + 1)
+        self.assertFalse(grid.is_consistent(), 'Wrong digit in a proper puzzle left it consistent.')
+        grid.clear_cell((i, j))
+        self.assertEqual(grid.solve(), self.expected_solution, 'Solution lost after clearing a cell.')
+        self.assertEqual(grid.candidates((i, j)), ConstraintState(self.test_problem).candidates(i, j),
+                         'Session candidates incorrect.')
+        self.assertEqual(grid.candidates((0, 1)), 0, 'Filled cell should have no candidates.')
+        row = [val for val in self.test_problem[0] if val != 0]
+        grid.set_cell((0, self.test_problem[0].index(0)), row[0])
+        self.assertFalse(grid.is_consistent(), 'Repeated digit not detected.')
+        grid.clear_cell((0, self.test_problem[0].index(0)))
+        self.assertTrue(grid.is_consistent(), 'Repeated digit not undone.')
+        self.assertEqual(grid.counts['searched'], 1, 'Edits should be answered without a new search.')